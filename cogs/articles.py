@@ -10,7 +10,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 
-from services.api_client import APIClient
+from services.api_client import APIClient, load_api_keys
 from services.db import Database
 
 logger = logging.getLogger("discord_bot")
@@ -119,14 +119,7 @@ class ArticleScanner(commands.Cog, name="article_scanner"):
     async def _ensure_services_and_start(self) -> None:
         base_url = self.config.get("api_base_url", "https://api.example.local")
         db_path = self.config.get("articles_db_path", "database/articles.db")
-        api_keys = None
-        try:
-            with open("_api_keys.json", "r") as kf:
-                api_keys = json.load(kf).get("keys", [])
-        except Exception:
-            logger.debug("No _api_keys.json found or failed to parse")
-
-        self._client = APIClient(base_url=base_url, api_keys=api_keys)
+        self._client = APIClient(base_url=base_url, api_keys=load_api_keys())
         await self._client.start()
         # Reuse the same external.db as the production poller
         self._db = Database(db_path)
@@ -226,12 +219,14 @@ class ArticleScanner(commands.Cog, name="article_scanner"):
             return
 
         # Process newest-first; items are typically newest-first from the API
+        unseen = await self._db.filter_unseen_articles(
+            str(article.get("id") or article.get("_id") or "") for article in items
+        )
         for article in items:
             aid = str(article.get("id") or article.get("_id") or "")
-            if not aid:
-                continue
-            if await self._db.has_seen_article(aid):
+            if not aid or aid not in unseen:
                 continue
+            unseen.discard(aid)  # the same article may appear twice in one page
 
             # New article — fetch full details for content
             await self._post_article(article, aid, channel_id)
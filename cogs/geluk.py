@@ -10,7 +10,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from services.api_client import APIClient
+from services.api_client import APIClient, load_api_keys
 
 logger = logging.getLogger("discord_bot")
 
@@ -171,13 +171,7 @@ class Geluk(commands.Cog, name="geluk"):
     async def _get_client(self) -> APIClient:
         if self._client is None:
             base_url = self.config.get("api_base_url", "https://api2.warera.io/trpc")
-            api_keys = None
-            try:
-                with open("_api_keys.json") as f:
-                    api_keys = json.load(f).get("keys", [])
-            except FileNotFoundError:
-                pass
-            self._client = APIClient(base_url=base_url, api_keys=api_keys)
+            self._client = APIClient(base_url=base_url, api_keys=load_api_keys())
             await self._client.start()
         return self._client
 
@@ -218,11 +212,9 @@ class Geluk(commands.Cog, name="geluk"):
         """Return getUserLite data for a user."""
         client = await self._get_client()
         try:
-            raw = await client.get(
-                "/user.getUserLite",
-                params={"input": json.dumps({"userId": user_id})},
-            )
-            return _unwrap(raw) if isinstance(raw, dict) else None
+            # coalesced: concurrent lookups (see _resolve_user_from_query) share one batch
+            data = _unwrap(await client.coalesced_get("/user.getUserLite", {"userId": user_id}))
+            return data if isinstance(data, dict) else None
         except Exception as exc:
             logger.warning("Geluk: getUserLite failed for %s: %s", user_id, exc)
             return None
@@ -249,11 +241,10 @@ class Geluk(commands.Cog, name="geluk"):
         if not user_ids:
             return None, None
 
-        candidates: list[tuple[str, dict]] = []
-        for uid in user_ids:
-            p = await self._get_user_profile(uid)
-            if p is not None:
-                candidates.append((uid, p))
+        profiles = await asyncio.gather(*(self._get_user_profile(uid) for uid in user_ids))
+        candidates: list[tuple[str, dict]] = [
+            (uid, p) for uid, p in zip(user_ids, profiles) if p is not None
+        ]
 
         for uid, p in candidates:
             if (p.get("username") or "").lower().strip() == s_low:
@@ -508,7 +499,7 @@ class Geluk(commands.Cog, name="geluk"):
                     # Use the total from the last completed sweep so the denominator
                     # stays consistent even while a new sweep is in progress.
                     try:
-                        _stored = await db.get_poll_state("luck_ranking_total")
+                        _stored = await db.get_poll_state("luck_ranking_total", use_cache=False)
                         rank_total = int(_stored) if _stored else len(ranking)
                     except Exception:
                         rank_total = len(ranking)
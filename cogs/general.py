@@ -60,14 +60,16 @@ class General(commands.Cog, name="general"):
         if message.author.bot:
             return
         content = message.content or ""
-        self.bot.logger.debug(f"Received message: {content} from {message.author} in {getattr(message.channel, 'id', 'DM')}")
+        self.bot.logger.debug(
+            "Received message: %s from %s in %s", content, message.author, getattr(message.channel, "id", "DM")
+        )
         if "app.warera.io" not in content:
             return
         try:
             await message.edit(suppress=True)
-            self.bot.logger.info(f"Suppressed embeds for message {message.id} in {getattr(message.channel, 'id', 'DM')}")
+            self.bot.logger.info("Suppressed embeds for message %s in %s", message.id, getattr(message.channel, "id", "DM"))
         except (discord.Forbidden, discord.HTTPException) as e:
-            self.bot.logger.error(f"Failed to suppress embeds for message {message.id}: {e}")
+            self.bot.logger.error("Failed to suppress embeds for message %s: %s", message.id, e)
 
     # Message context menu command
     async def remove_spoilers(
@@ -323,6 +323,32 @@ class Owner(commands.Cog, name="owner"):
         )
         await context.send(embed=embed)
 
+    @commands.command(
+        name="vacuumdb",
+        description="Herschrijf de database eenmalig zodat vrije pagina's teruggegeven kunnen worden.",
+    )
+    @commands.is_owner()
+    async def vacuumdb(self, context: Context) -> None:
+        poller = self.bot.cogs.get("production_checker")
+        if poller is None or not getattr(poller, "_db", None):
+            embed = discord.Embed(
+                description="❌ De poller/DB is niet beschikbaar.", color=self.color
+            )
+            await context.send(embed=embed)
+            return
+
+        status_msg = await context.send("⏳ Database wordt gevacuümeerd…")
+        try:
+            changed = await poller._db.enable_incremental_vacuum()
+        except Exception as exc:
+            await status_msg.edit(content=f"❌ VACUUM mislukt: {exc}")
+            return
+
+        if changed:
+            await status_msg.edit(content="🧹 Database gevacuümeerd; incrementele auto-vacuum staat aan.")
+        else:
+            await status_msg.edit(content="✅ Incrementele auto-vacuum stond al aan; niets te doen.")
+
     @commands.hybrid_command(
         name="shutdown",
         description="Zet de bot uit.",
@@ -2,17 +2,18 @@
 
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from discord.ext.commands import Context
 import asyncio
 
-from services.api_client import APIClient
-from services.db import Database
+from services.api_client import APIClient, load_api_keys
+from services.db import Database, TopRow
 from services.citizen_cache import CitizenCache
-from services.country_utils import extract_country_list, find_country, country_id as cid_of, ALL_COUNTRY_NAMES
+from services import json_utils
+from services.country_utils import extract_country_list, find_country, country_id as cid_of, ALL_COUNTRY_NAMES, CountryIndex, autocomplete_prefix
 from utils.checks import has_privileged_role
 
 logger = logging.getLogger("discord_bot")
@@ -33,6 +34,10 @@ _LUCK_WEIGHT_TOTAL: float = sum(_LUCK_WEIGHTS.values())
 _BATTLE_URL = "https://app.warera.io/battle/{battle_id}"
 _WAR_URL    = "https://app.warera.io/war/{war_id}"
 
+# Shared read-only default for `.get(..., _EMPTY)` chains over API payloads,
+# so nested lookups need a single type check instead of one per level.
+_EMPTY: dict = {}
+
 _EVENT_POLL_TYPES = ["battleOpened", "warDeclared", "peaceMade", "peace_agreement"]
 
 _EVENT_LABELS: dict[str, str] = {
@@ -76,6 +81,8 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         self._client: APIClient | None = None
         self._db: Database | None = None
         self._citizen_cache: CitizenCache | None = None
+        # (getAllCountries response, index built from it); see _fetch_country_list
+        self._country_index: tuple[object, CountryIndex] | None = None
         self._poll_lock: asyncio.Lock = asyncio.Lock()
         # Shared lock: only one heavy sweep (luck refresh / manual peil_burgers) may
         # run at a time.  Concurrent sweeps would saturate the API rate limit.
@@ -89,34 +96,38 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         self.daily_citizen_refresh.cancel()
         self.daily_luck_refresh.cancel()
         self.event_poll.cancel()
+        self.db_maintenance.cancel()
+        asyncio.create_task(self._close_services())
+
+    async def _close_services(self) -> None:
+        # Background revalidations use both the client and the DB, so stop them first.
+        if self._citizen_cache:
+            await self._citizen_cache.close()
         if self._client:
-            asyncio.create_task(self._client.close())
+            await self._client.close()
         if self._db:
-            asyncio.create_task(self._db.close())
+            await self._db.close()
 
     async def _ensure_services_and_start(self) -> None:
         base_url = self.config.get("api_base_url", "https://api.example.local")
         db_path = self.config.get("external_db_path", "database/external.db")
-        api_keys = None
-        try:
-            with open("_api_keys.json", "r") as kf:
-                api_keys = json.load(kf).get("keys", [])
-        except Exception:
-            self.bot.logger.debug("No _api_keys.json found or failed to parse")
-
-        self._client = APIClient(base_url=base_url, api_keys=api_keys)
+        self._client = APIClient(base_url=base_url, api_keys=load_api_keys())
         await self._client.start()
-        self._db = Database(db_path)
+        # Automatic checkpoints stall readers mid-poll; db_maintenance runs them instead.
+        self._db = Database(db_path, wal_autocheckpoint=0)
         await self._db.setup()
         # Expose the shared DB on the bot so other cogs (e.g. geluk.py) can reuse
         # the same connection instead of opening a second one (which causes DB-locked errors).
         self.bot._ext_db = self._db
-        self._citizen_cache = CitizenCache(self._client, self._db)
+        self._citizen_cache = CitizenCache(
+            self._client, self._db, sweep_lock=self._heavy_api_lock
+        )
 
         self.hourly_production_check.start()
         self.daily_citizen_refresh.start()
         self.daily_luck_refresh.start()
         self.event_poll.start()
+        self.db_maintenance.start()
 
     # ------------------------------------------------------------------ #
     # Hourly production poll                                               #
@@ -193,7 +204,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 return []
 
             try:
-                all_countries = await self._client.get("/country.getAllCountries")
+                all_countries = await self._client.get_cached("/country.getAllCountries")
             except Exception:
                 self.bot.logger.exception("Failed to fetch country list")
                 return []
@@ -202,13 +213,14 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             if not country_list:
                 return []
 
-            now = datetime.utcnow().isoformat() + "Z"
+            now = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
 
             # cid → country object — used to look up name from a country ID
             cid_to_country: dict[str, dict] = {cid_of(c): c for c in country_list}
 
             # items_to_poll: set of item codes that have at least one specialized country
             items_to_poll: set[str] = set()
+            snapshots: list[tuple] = []
             for country in country_list:
                 item = (
                     country.get("specializedItem")
@@ -219,14 +231,15 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                     continue
                 items_to_poll.add(item)
                 if self._db:
-                    pb = self._get_permanent_bonus(country)
-                    try:
-                        await self._db.save_country_snapshot(
-                            cid_of(country), country.get("code"), country.get("name"),
-                            item, pb, json.dumps(country, default=str), now,
-                        )
-                    except Exception:
-                        self.bot.logger.exception("Failed to save snapshot for country %s", cid_of(country))
+                    snapshots.append((
+                        cid_of(country), country.get("code"), country.get("name"),
+                        item, self._get_permanent_bonus(country), json_utils.dumps(country), now,
+                    ))
+            if self._db:
+                try:
+                    await self._db.save_country_snapshots(snapshots)
+                except Exception:
+                    self.bot.logger.exception("Failed to save %d country snapshots", len(snapshots))
 
             # Build regionId → countryId map from region.getRegionsObject.
             # Each region object contains a "country" field = current owner's countryId.
@@ -234,24 +247,23 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             try:
                 regions_resp = await self._client.get("/region.getRegionsObject")
                 regions_data = (
-                    regions_resp.get("result", {}).get("data", {})
-                    if isinstance(regions_resp, dict) else {}
+                    regions_resp.get("result", _EMPTY).get("data", _EMPTY)
+                    if isinstance(regions_resp, dict) else _EMPTY
                 )
-                if isinstance(regions_data, dict):
-                    for rid, robj in regions_data.items():
-                        cid = robj.get("country") if isinstance(robj, dict) else None
-                        if cid:
-                            region_to_cid[rid] = cid
-                region_to_name: dict[str, str] = {
-                    rid: robj.get("name", rid)
-                    for rid, robj in (regions_data.items() if isinstance(regions_data, dict) else [])
-                    if isinstance(robj, dict)
-                }
+                region_to_name: dict[str, str] = {}
+                for rid, robj in regions_data.items():
+                    if not isinstance(robj, dict):
+                        continue
+                    cid = robj.get("country")
+                    if cid:
+                        region_to_cid[rid] = cid
+                    region_to_name[rid] = robj.get("name", rid)
             except Exception:
                 self.bot.logger.exception("Failed to fetch region map; deposit names will be unavailable")
                 region_to_name = {}
 
             changes: list[tuple[str, str, str]] = []
+            tops: list[tuple] = []
             for item in items_to_poll:
                 try:
                     resp = await self._client.get(
@@ -268,10 +280,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
 
                 # ---- Long-term leader: max(strategic + ethicSpec + ethicDeposit) ----
                 # ethicDepositBonus is semi-permanent (party ethics), only raw depositBonus is temporary
-                top_perm = max(
-                    region_list,
-                    key=lambda r: (r.get("strategicBonus") or 0) + (r.get("ethicSpecializationBonus") or 0) + (r.get("ethicDepositBonus") or 0),
-                )
+                top_perm = max(region_list, key=self._permanent_region_bonus)
                 perm_strategic = top_perm.get("strategicBonus") or 0
                 perm_ethic = top_perm.get("ethicSpecializationBonus") or 0
                 perm_ethic_dep = top_perm.get("ethicDepositBonus") or 0
@@ -283,7 +292,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 if perm_bonus > 0:
                     change = await self._handle_permanent_leader(
                         item, perm_cid or "unknown", perm_name, perm_bonus,
-                        perm_strategic, perm_ethic, perm_ethic_dep, now, market_channel_id
+                        perm_strategic, perm_ethic, perm_ethic_dep, now, market_channel_id, tops,
                     )
                     if change:
                         changes.append(change)
@@ -298,16 +307,8 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 # ---- Short-term top (longest remaining deposit duration) ----
                 deposit_regions = [r for r in region_list if (r.get("depositBonus") or 0) > 0]
                 if deposit_regions:
-                    def _end_ts(r: dict) -> float:
-                        raw = r.get("depositEndAt") or r.get("deposit_end_at") or ""
-                        try:
-                            from datetime import timezone
-                            return datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
-                        except Exception:
-                            return 0.0
-
                     # Pick region with highest total bonus; use longest deposit as tiebreaker
-                    top_dep = max(deposit_regions, key=lambda r: (r.get("bonus") or 0, _end_ts(r)))
+                    top_dep = max(deposit_regions, key=self._deposit_rank)
                     dep_total = top_dep.get("bonus") or 0
                     dep_deposit_raw = top_dep.get("depositBonus") or 0
                     dep_ethic_dep_raw = top_dep.get("ethicDepositBonus") or 0
@@ -325,6 +326,12 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                     if change:
                         changes.append(change)
 
+            if self._db:
+                try:
+                    await self._db.set_top_specializations(tops)
+                except Exception:
+                    self.bot.logger.exception("Failed to persist %d permanent leaders", len(tops))
+
         except Exception as e:
             self.bot.logger.error("Error in production poll: %s", e)
             return []
@@ -333,47 +340,71 @@ class ProductionChecker(commands.Cog, name="production_checker"):
 
     @staticmethod
     def _get_permanent_bonus(country: dict) -> float | None:
-        """Country's permanent production bonus (strategic + party ethics, no deposit)."""
+        """Country's permanent production bonus (strategic + party ethics, no deposit).
+
+        Falls back to the strategic-resource production percentage when the
+        ranking entry is missing.
+        """
+        rankings = country.get("rankings")
+        rb = rankings.get("countryProductionBonus") if isinstance(rankings, dict) else None
+        if isinstance(rb, dict):
+            v = rb.get("value")
+            if v is not None:
+                try:
+                    return float(v)
+                except (TypeError, ValueError):
+                    pass
+        resources = country.get("strategicResources")
+        bonuses = resources.get("bonuses") if isinstance(resources, dict) else None
+        sp = bonuses.get("productionPercent") if isinstance(bonuses, dict) else None
+        if sp is None:
+            return None
         try:
-            rb = country.get("rankings", {}).get("countryProductionBonus")
-            if isinstance(rb, dict) and "value" in rb:
-                return float(rb["value"])
+            return float(sp)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _permanent_region_bonus(region: dict) -> float:
+        """Sort key: strategic + ethic specialization + ethic deposit bonus."""
+        get = region.get
+        return (get("strategicBonus") or 0) + (get("ethicSpecializationBonus") or 0) + (get("ethicDepositBonus") or 0)
+
+    @staticmethod
+    def _deposit_rank(region: dict) -> tuple[float, float]:
+        """Sort key: (total bonus, deposit end timestamp) — longest deposit breaks ties."""
+        raw = region.get("depositEndAt") or region.get("deposit_end_at") or ""
+        try:
+            end_ts = datetime.fromisoformat(raw.replace("Z", "+00:00")).timestamp()
         except Exception:
-            pass
-        return None
+            end_ts = 0.0
+        return (region.get("bonus") or 0, end_ts)
 
     @staticmethod
     def _unwrap_region_list(api_response) -> list[dict]:
-        if isinstance(api_response, list):
-            return [r for r in api_response if isinstance(r, dict)]
-        if isinstance(api_response, dict):
-            result = api_response.get("result")
-            if isinstance(result, dict):
-                data = result.get("data")
-                if isinstance(data, list):
-                    return [r for r in data if isinstance(r, dict)]
-            for key in ("data", "items", "regions"):
-                v = api_response.get(key)
-                if isinstance(v, list):
-                    return [r for r in v if isinstance(r, dict)]
-        return []
+        return APIClient.normalize_list(api_response, ("data", "items", "regions"))
 
     async def _handle_permanent_leader(
         self, item: str, country_id: str, country_name: str,
         bonus: float, strategic_bonus: float, ethic_bonus: float, ethic_deposit_bonus: float,
-        now: str, channel_id: int,
+        now: str, channel_id: int, pending: list[tuple],
     ) -> tuple | None:
+        """Announce a new permanent leader for *item* and queue its row.
+
+        The row for ``specialization_top`` is appended to *pending*; the
+        caller writes all items' rows in one transaction.
+        """
         try:
             prev = await self._db.get_top_specialization(item) if self._db else None
         except Exception:
             prev = None
 
-        prev_bonus = float(prev.get("production_bonus") or 0) if prev else 0.0
+        prev_bonus = float(prev.production_bonus or 0) if prev else 0.0
         # Only report when the best permanent bonus actually increases
         changed = prev is None or (bonus > prev_bonus + 0.01)
 
         if changed and prev is not None:
-            old_desc = f"{prev.get('country_name')} ({prev.get('production_bonus')}%)"
+            old_desc = f"{prev.country_name} ({prev.production_bonus}%)"
             for guild in self.bot.guilds:
                 channel = guild.get_channel(channel_id)
                 if channel:
@@ -384,18 +415,13 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                     except Exception:
                         self.bot.logger.exception("Failed sending permanent leader update for %s", item)
 
-        if self._db:
-            try:
-                await self._db.set_top_specialization(
-                    item, country_id, country_name, float(bonus), now,
-                    strategic_bonus=strategic_bonus, ethic_bonus=ethic_bonus,
-                    ethic_deposit_bonus=ethic_deposit_bonus,
-                )
-            except Exception:
-                self.bot.logger.exception("Failed to persist permanent leader for %s", item)
+        pending.append((
+            item, country_id, country_name, float(bonus),
+            strategic_bonus, ethic_bonus, ethic_deposit_bonus, now,
+        ))
 
         if changed and prev is not None:
-            old_desc = f"{prev.get('country_name')} ({prev.get('production_bonus')}%)"
+            old_desc = f"{prev.country_name} ({prev.production_bonus}%)"
             return (item, old_desc, f"{country_name} ({bonus}%)")
         return None
 
@@ -477,11 +503,11 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             return "0%"
 
     @staticmethod
-    def _long_bd(t: dict) -> str:
+    def _long_bd(t: TopRow) -> str:
         parts: list[str] = []
-        if t.get("strategic_bonus"): parts.append(f"{t['strategic_bonus']}% strat")
-        if t.get("ethic_bonus"): parts.append(f"{t['ethic_bonus']}% eth")
-        if t.get("ethic_deposit_bonus"): parts.append(f"{t['ethic_deposit_bonus']}% eth.dep")
+        if t.strategic_bonus: parts.append(f"{t.strategic_bonus}% strat")
+        if t.ethic_bonus: parts.append(f"{t.ethic_bonus}% eth")
+        if t.ethic_deposit_bonus: parts.append(f"{t.ethic_deposit_bonus}% eth.dep")
         return " + ".join(parts)
 
     @staticmethod
@@ -532,7 +558,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         import time as _time
         _t0_citizen = _time.monotonic()
         try:
-            all_countries = await self._client.get("/country.getAllCountries")
+            all_countries = await self._client.get_cached("/country.getAllCountries")
         except Exception:
             self.bot.logger.exception("daily_citizen_refresh: failed to fetch countries")
             return
@@ -716,16 +742,17 @@ class ProductionChecker(commands.Cog, name="production_checker"):
 
         MIN_OPENS = 20
         recorded = 0
+        updated_at = now_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
+        # Scores are buffered and written in one transaction per 10 users, so no
+        # write transaction stays open across the API calls in between.
+        scores: list[tuple] = []
         for i, (user_id, citizen_name) in enumerate(citizens):
             try:
                 counts, total_opens = await self._fetch_luck_data(user_id, item_rarities)
                 if total_opens < MIN_OPENS:
                     continue  # too few opens for a meaningful score
                 luck_pct = _calc_luck_pct(counts, total_opens)
-                updated_at = now_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
-                await self._db.upsert_luck_score(
-                    user_id, nl_country_id, citizen_name, luck_pct, total_opens, updated_at
-                )
+                scores.append((user_id, nl_country_id, citizen_name, luck_pct, total_opens, updated_at))
                 recorded += 1
             except Exception:
                 self.bot.logger.exception(
@@ -733,7 +760,8 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 )
             # Periodic flush + rate limit
             if (i + 1) % 10 == 0:
-                await self._db.flush_luck_scores()
+                await self._db.bulk_upsert_luck_scores(scores)
+                scores.clear()
                 await asyncio.sleep(1.0)
 
             if progress_cb and ((i + 1) % 5 == 0 or (i + 1) == total):
@@ -742,7 +770,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 except Exception:
                     self.bot.logger.debug("daily_luck_refresh: progress callback failed at %d/%d", i + 1, total)
 
-        await self._db.flush_luck_scores()
+        await self._db.bulk_upsert_luck_scores(scores)
         # Store the final ranked count so /geluk always shows a consistent denominator.
         try:
             await self._db.set_poll_state("luck_ranking_total", str(recorded))
@@ -792,18 +820,34 @@ class ProductionChecker(commands.Cog, name="production_checker"):
     async def before_event_poll(self) -> None:
         await self.bot.wait_until_ready()
 
+    @tasks.loop(minutes=10)
+    async def db_maintenance(self) -> None:
+        """Fold the WAL back into the database file between polls; trim free pages daily."""
+        if not self._db:
+            return
+        try:
+            busy, frames, done = await self._db.checkpoint()
+            if busy or done < frames:
+                self.bot.logger.debug("db_maintenance: checkpointed %d/%d frames (busy=%d)", done, frames, busy)
+            if self.db_maintenance.current_loop % 144 == 0:  # once a day
+                await self._db.incremental_vacuum()
+        except Exception:
+            self.bot.logger.exception("db_maintenance: failed")
+
     @staticmethod
     def _extract_event_type(event: dict) -> str:
         """Extract and normalize event type from varying API payload shapes."""
         if not isinstance(event, dict):
             return "unknown"
-        edata = event.get("data") or event.get("eventData") or {}
+        edata = event.get("data") or event.get("eventData") or _EMPTY
+        if not isinstance(edata, dict):
+            edata = _EMPTY
         raw = (
             event.get("type")
             or event.get("eventType")
             or event.get("event_type")
-            or (edata.get("type") if isinstance(edata, dict) else None)
-            or (edata.get("eventType") if isinstance(edata, dict) else None)
+            or edata.get("type")
+            or edata.get("eventType")
             or "unknown"
         )
         normalized = str(raw).strip()
@@ -849,10 +893,14 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             )
             return
 
+        unseen = await self._db.filter_unseen_events(
+            str(event.get("id") or event.get("_id") or "") for event in items
+        )
         for event in items:
             eid = str(event.get("id") or event.get("_id") or "")
-            if not eid or await self._db.has_seen_event(eid):
+            if not eid or eid not in unseen:
                 continue
+            unseen.discard(eid)  # the same event may appear twice in one page
             event_type = self._extract_event_type(event)
             if event_type not in _EVENT_LABELS:
                 self.bot.logger.warning(
@@ -973,9 +1021,12 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             if slot == "defender" and defender_name:
                 continue
             try:
-                c_resp = await self._client.get(
+                # Every event in a poll involves NL, so the same country IDs
+                # recur; the cache turns repeats into a single request.
+                c_resp = await self._client.get_cached(
                     "/country.getCountryById",
                     params={"input": json.dumps({"countryId": c_id})},
+                    ttl=300,
                 )
                 c_data: dict = {}
                 if isinstance(c_resp, dict):
@@ -995,7 +1046,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             event.get("createdAt")
             or event.get("date")
             or event.get("timestamp")
-            or (edata.get("createdAt") if isinstance(edata, dict) else None)
+            or _first("createdAt")
         )
         timestamp: datetime | None = None
         if ts_str:
@@ -1018,7 +1069,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
                 attacker_name=attacker_name,
                 defender_name=defender_name,
                 created_at=ts_str,
-                raw_json=json.dumps(event, ensure_ascii=False),
+                raw_json=json_utils.dumps(event),
             )
         except Exception:
             self.bot.logger.exception("event_poll: failed to store event %s", event_id)
@@ -1142,11 +1193,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             await ctx.send("Database niet geïnitialiseerd.")
             return
         try:
-            await self._db._conn.execute("UPDATE specialization_top SET production_bonus = 0")
-            await self._db._conn.execute("UPDATE deposit_top SET bonus = 0")
-            await self._db._conn.commit()
-            rows = await self._db._conn.execute("SELECT COUNT(*) FROM specialization_top")
-            count = (await rows.fetchone())[0]
+            count = await self._db.zero_production_tops()
             if count == 0:
                 await ctx.send(
                     "Tabellen zijn leeg — run eerst `!peil_nu` om ze te vullen, dan `!nep_leider`, dan `!peil_nu` opnieuw."
@@ -1200,14 +1247,14 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             return
 
         dep_by_item = {d.get("item"): d for d in deposit_tops}
-        top_by_item = {t.get("item"): t for t in tops}
+        top_by_item = {t.item: t for t in tops}
         all_items = sorted(set(top_by_item) | set(dep_by_item))
 
         long_rows = [(item, top_by_item[item]) for item in all_items if item in top_by_item]
         short_rows = [(item, dep_by_item[item]) for item in all_items if item in dep_by_item]
 
         best_l_idx = (
-            max(range(len(long_rows)), key=lambda i: float(long_rows[i][1].get("production_bonus") or 0))
+            max(range(len(long_rows)), key=lambda i: float(long_rows[i][1].production_bonus or 0))
             if long_rows else None
         )
         best_s_idx = (
@@ -1220,14 +1267,14 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         # ── Long-term embed ──────────────────────────────────────────────
         if long_rows:
             wi = max(max(len(item) for item, _ in long_rows), 4)
-            wc = max(max(len(t.get("country_name") or "") for _, t in long_rows), 7)
-            wb = max(max(len(self._pct(t.get("production_bonus"))) for _, t in long_rows), 5)
+            wc = max(max(len(t.country_name or "") for _, t in long_rows), 7)
+            wb = max(max(len(self._pct(t.production_bonus)) for _, t in long_rows), 5)
             bds_l = [self._long_bd(t) for _, t in long_rows]
             wbd = max(max(len(bd) for bd in bds_l), 9)
             hdr_l = f"  {'Item':<{wi}}  {'Land':<{wc}}  {'Bonus':>{wb}}  {'Specificatie':<{wbd}}"
             sep_l = "  " + "-" * (len(hdr_l) - 2)
             rows_l = [
-                f"{'>' if i == best_l_idx else ' '} {item:<{wi}}  {(t.get('country_name') or 'Onbekend'):<{wc}}  {self._pct(t.get('production_bonus')):>{wb}}  {bd:<{wbd}}"
+                f"{'>' if i == best_l_idx else ' '} {item:<{wi}}  {(t.country_name or 'Onbekend'):<{wc}}  {self._pct(t.production_bonus):>{wb}}  {bd:<{wbd}}"
                 for i, ((item, t), bd) in enumerate(zip(long_rows, bds_l))
             ]
             table_l = "\n".join([hdr_l, sep_l] + rows_l)
@@ -1284,7 +1331,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             bl_item, bl = long_rows[best_l_idx]
             best_embed.add_field(
                 name="🏆 Hoogste langetermijn",
-                value=f"**{bl_item}** — {bl.get('country_name')} **{bl.get('production_bonus')}%**",
+                value=f"**{bl_item}** — {bl.country_name} **{bl.production_bonus}%**",
                 inline=False,
             )
         if best_s_idx is not None:
@@ -1314,7 +1361,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             return
         if hasattr(ctx, 'defer'):
             await ctx.defer()
-        tops: list[dict] = []
+        tops: list[TopRow] = []
         deposit_tops: list[dict] = []
         try:
             tops = await self._db.get_all_tops()
@@ -1332,12 +1379,12 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         embed = discord.Embed(title="Hoogste Productiebonussen", colour=colour)
 
         if tops:
-            bl = max(tops, key=lambda t: float(t.get("production_bonus") or 0))
+            bl = max(tops, key=lambda t: float(t.production_bonus or 0))
             bd = self._long_bd(bl)
             embed.add_field(
                 name="🏆 Hoogste langetermijn",
                 value=(
-                    f"**{bl.get('item')}** — {bl.get('country_name')} **{bl.get('production_bonus')}%**"
+                    f"**{bl.item}** — {bl.country_name} **{bl.production_bonus}%**"
                     + (f"\n*{bd}*" if bd else "")
                 ),
                 inline=False,
@@ -1369,9 +1416,7 @@ class ProductionChecker(commands.Cog, name="production_checker"):
             await ctx.send("Database niet geïnitialiseerd.")
             return
         try:
-            await self._db._conn.execute("DELETE FROM specialization_top")
-            await self._db._conn.execute("DELETE FROM deposit_top")
-            await self._db._conn.commit()
+            await self._db.clear_production_tops()
             await ctx.send("✅ Tabellen `specialization_top` en `deposit_top` gewist. Run `!peil_nu` om ze opnieuw te vullen.")
         except Exception:
             self.bot.logger.exception("Failed to clear production tables")
@@ -1611,13 +1656,20 @@ class ProductionChecker(commands.Cog, name="production_checker"):
     async def _country_autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> list[app_commands.Choice[str]]:
-        """Autocomplete for country parameters: filters ALL_COUNTRY_NAMES."""
+        """Autocomplete for country parameters: filters ALL_COUNTRY_NAMES.
+
+        Prefix matches come first (bisect over the pre-sorted names); the
+        remaining slots are filled with names that merely contain the query.
+        """
         q = current.strip().lower()
-        return [
-            app_commands.Choice(name=name, value=name)
-            for name in ALL_COUNTRY_NAMES
-            if q in name.lower()
-        ][:25]
+        names = autocomplete_prefix(q, 25)
+        if len(names) < 25:
+            seen = set(names)
+            names += [
+                name for name in ALL_COUNTRY_NAMES
+                if name not in seen and q in name.lower()
+            ][: 25 - len(names)]
+        return [app_commands.Choice(name=name, value=name) for name in names]
 
     # ------------------------------------------------------------------ #
     # Commands — citizen levels                                            #
@@ -2230,21 +2282,23 @@ class ProductionChecker(commands.Cog, name="production_checker"):
         t_start = time.monotonic()
         total_recorded = 0
         failed: list[str] = []
-        for i, c in enumerate(countries, 1):
-            cid = cid_of(c)
-            name = c.get("name", cid)
-            if n > 1:
-                await status_msg.edit(content=f"Refreshing citizen levels… ({i}/{n}) **{name}**")
-            try:
-                recorded = await self._citizen_cache.refresh_country(
-                    cid, name,
-                    progress_msg=status_msg if n == 1 else None,
-                )
-                total_recorded += recorded
-                self.bot.logger.info("poll_citizens: %s — %d levels cached", name, recorded)
-            except Exception:
-                self.bot.logger.exception("poll_citizens: error for %s", name)
-                failed.append(name)
+        async with self._heavy_api_lock:
+            for i, c in enumerate(countries, 1):
+                cid = cid_of(c)
+                name = c.get("name", cid)
+                if n > 1:
+                    await status_msg.edit(content=f"Refreshing citizen levels… ({i}/{n}) **{name}**")
+                try:
+                    recorded = await self._citizen_cache.refresh_country(
+                        cid, name,
+                        progress_msg=status_msg if n == 1 else None,
+                        hard_refresh=True,
+                    )
+                    total_recorded += recorded
+                    self.bot.logger.info("poll_citizens: %s — %d levels cached", name, recorded)
+                except Exception:
+                    self.bot.logger.exception("poll_citizens: error for %s", name)
+                    failed.append(name)
 
         elapsed = time.monotonic() - t_start
         elapsed_str = (
@@ -2275,14 +2329,20 @@ class ProductionChecker(commands.Cog, name="production_checker"):
     # Internal helpers                                                     #
     # ------------------------------------------------------------------ #
 
-    async def _fetch_country_list(self, ctx: Context) -> list[dict] | None:
-        """Fetch and unwrap the country list; sends an error to ctx on failure."""
+    async def _fetch_country_list(self, ctx: Context) -> CountryIndex | None:
+        """Fetch and unwrap the country list; sends an error to ctx on failure.
+
+        The returned :class:`CountryIndex` is rebuilt only when the cached
+        API response changes, so ``find_country`` lookups stay O(1).
+        """
         try:
-            resp = await self._client.get("/country.getAllCountries")
+            resp = await self._client.get_cached("/country.getAllCountries")
         except Exception as exc:
             await ctx.send(f"Ophalen van landen mislukt: {exc}")
             return None
-        result = extract_country_list(resp)
+        if self._country_index is None or self._country_index[0] is not resp:
+            self._country_index = (resp, CountryIndex(extract_country_list(resp)))
+        result = self._country_index[1]
         if not result:
             await ctx.send("Kon landenlijst niet ophalen van API.")
             return None
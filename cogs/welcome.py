@@ -129,7 +129,7 @@ async def create_verification_channel(interaction: discord.Interaction, request_
 
     if ticket_id is None:
         # fallback: use timestamp
-        ticket_id = int(datetime.datetime.utcnow().timestamp())
+        ticket_id = int(datetime.datetime.now(datetime.UTC).timestamp())
 
     # Configure channel properties based on request type
     roles_cfg = config.get("roles", {})
@@ -472,15 +472,15 @@ class Welcome(commands.Cog, name="welcome"):
             return
 
         # Check if the user has permission to moderate
-        mod_roles = [
+        mod_roles = {
             self.config["roles"]["border_control"],
             self.config["roles"]["minister_foreign_affairs"],
             self.config["roles"]["president"],
             self.config["roles"]["vice_president"]
-        ]
+        }
 
-        user_role_ids = [role.id for role in interaction.user.roles]
-        has_permission = any(role_id in user_role_ids for role_id in mod_roles if role_id)
+        user_role_ids = {role.id for role in interaction.user.roles}
+        has_permission = bool(user_role_ids & mod_roles)
 
         if not has_permission and not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message(
@@ -680,15 +680,15 @@ class Welcome(commands.Cog, name="welcome"):
             return
 
         # Check if the user has permission to moderate
-        mod_roles = [
+        mod_roles = {
             self.config["roles"]["border_control"],
             self.config["roles"]["minister_foreign_affairs"],
             self.config["roles"]["president"],
             self.config["roles"]["vice_president"]
-        ]
+        }
 
-        user_role_ids = [role.id for role in interaction.user.roles]
-        has_permission = any(role_id in user_role_ids for role_id in mod_roles if role_id)
+        user_role_ids = {role.id for role in interaction.user.roles}
+        has_permission = bool(user_role_ids & mod_roles)
 
         if not has_permission and not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message(
@@ -805,17 +805,17 @@ class Welcome(commands.Cog, name="welcome"):
             foreign_minister_role = interaction.guild.get_role(self.config["roles"]["minister_foreign_affairs"])
 
             # Check if the user has permission to moderate
-            mod_roles = [
+            mod_roles = {
                 self.config["roles"]["government"],
                 self.config["roles"]["president"],
                 self.config["roles"]["vice_president"]
-            ]
+            }
 
-            user_role_ids = [role.id for role in interaction.user.roles]
-            has_permission = any(role_id in user_role_ids for role_id in mod_roles if role_id)
+            user_role_ids = {role.id for role in interaction.user.roles}
+            has_permission = bool(user_role_ids & mod_roles)
 
             if not has_permission and not interaction.user.guild_permissions.administrator:
-                await interaction.response.send_message(
+                await reply(
                     "You don't have permission to use this command.",
                     ephemeral=True
                 )
@@ -833,7 +833,7 @@ class Welcome(commands.Cog, name="welcome"):
                         pass
 
             if not user_id:
-                await interaction.response.send_message(
+                await reply(
                     "Kon de gebruiker voor dit verzoek niet vinden. Controleer dit handmatig.",
                     ephemeral=True
                 )
@@ -841,7 +841,7 @@ class Welcome(commands.Cog, name="welcome"):
 
             member = interaction.guild.get_member(user_id)
             if not member:
-                await interaction.response.send_message(
+                await reply(
                     "De gebruiker is niet meer op de server.",
                     ephemeral=True
                 )
@@ -855,7 +855,7 @@ class Welcome(commands.Cog, name="welcome"):
             try:
                 await member.add_roles(embassy_role)
             except discord.Forbidden:
-                await interaction.response.send_message(
+                await reply(
                     f"I don't have permission to assign the {embassy_role.name} role. "
                     "Make sure my bot role is **higher** than this role in Server Settings > Roles.",
                     ephemeral=True
@@ -879,16 +879,16 @@ class Welcome(commands.Cog, name="welcome"):
 
             # Check if the embassy channel exists
             self.bot.logger.debug(f"Checking for existing embassy channel for country: {country}")
-            embassy_channel = None
-            for channel in interaction.guild.channels:
-                if channel.name == f"{country.lower()}-embassy" or channel.name == f"{country.lower()}-ambassade":
-                    embassy_channel = channel
-                    break
+            country_key = country.lower()
+            candidates = (f"{country_key}-embassy", f"{country_key}-ambassade")
+            embassy_channel = next(
+                (ch for ch in interaction.guild.channels if ch.name in candidates), None
+            )
 
             if not embassy_channel:
                 # Create the ticket channel
                 self.bot.logger.debug(f"Creating embassy channel for country: {country}")
-                channel_name = f"{country.lower()}-embassy"
+                channel_name = candidates[0]
                 # choose a category from config when available
                 cat_id = self.bot.config.get("channels", {}).get("embassy_category") or self.bot.config.get("channels", {}).get("verification")
                 category = interaction.guild.get_channel(cat_id) if cat_id else None
@@ -927,7 +927,7 @@ class Welcome(commands.Cog, name="welcome"):
                     if category:
                         error_msg += f"• Voeg de bot toe aan de **{category.name}** categorie met 'Kanalen beheren' toestemming\n"
                     error_msg += f"\n**Fout:** {e}"
-                    await interaction.response.send_message(error_msg, ephemeral=True)
+                    await reply(error_msg, ephemeral=True)
                     return
 
             if embassy_channel:
@@ -5,4 +5,4 @@ Keep this file to mark `services` as a Python package so imports like
 from the project root (e.g. `python -m scripts.run_poll_once`).
 """
 
-__all__ = ["api_client", "db", "worker"]
+__all__ = ["api_client", "db", "json_utils", "worker"]
@@ -1,19 +1,104 @@
 import asyncio
+import functools
 import logging
 import json as _json
-from typing import Any, Dict, Optional, Sequence
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote
+from typing import Any, Dict, Literal, Optional, Sequence, Tuple
 
 import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from services import json_utils
 
 logger = logging.getLogger("services.api_client")
 
+_BACKOFF_BASE = 1.0
+_BACKOFF_CAP = 30.0
+_rng = random.SystemRandom()
+MAX_RETRY_AFTER = 60.0
+# conservative cap for GET batch URLs; longer batches are split in half
+MAX_URL_LENGTH = 8000
+# conditional-GET validators kept (least recently used evicted first) and how
+# long one stays usable; sized for an hourly citizen refresh of one country
+MAX_VALIDATORS = 256
+VALIDATOR_TTL = 2 * 3600.0
+
+
+def _next_backoff(prev: float) -> float:
+	"""Return the next retry delay using decorrelated jitter.
+
+	Randomising the delay keeps concurrent callers that failed together from
+	retrying in lockstep against an already overloaded endpoint.
+	"""
+	return _rng.uniform(_BACKOFF_BASE, min(_BACKOFF_CAP, prev * 3))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+	"""Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+
+	The result is clamped to ``MAX_RETRY_AFTER`` so a misbehaving server
+	cannot stall a whole batch for hours. Returns None when unparseable.
+	"""
+	if value is None:
+		return None
+	try:
+		seconds = float(value)
+	except ValueError:
+		try:
+			when = parsedate_to_datetime(value)
+		except (TypeError, ValueError):
+			return None
+		if when.tzinfo is None:
+			when = when.replace(tzinfo=timezone.utc)
+		seconds = (when - datetime.now(timezone.utc)).total_seconds()
+	seconds = max(seconds, 0.0)
+	if seconds > MAX_RETRY_AFTER:
+		logger.warning("Retry-After of %.0fs clamped to %.0fs", seconds, MAX_RETRY_AFTER)
+		return MAX_RETRY_AFTER
+	return seconds
+
+
+@functools.lru_cache(maxsize=64)
+def _batch_path(proc: str, count: int) -> str:
+	"""Return the tRPC batch path ``/proc,proc,...`` for *count* calls."""
+	return "/" + ",".join([proc] * count)
+
+
+@functools.cache
+def _parse_api_keys(path: str) -> Tuple[str, ...]:
+	# Raises on a missing or malformed file, so only successful parses are cached.
+	with open(path, "rb") as f:
+		return tuple(json_utils.loads(f.read()).get("keys", []))
+
+
+def load_api_keys(path: str = "_api_keys.json") -> Tuple[str, ...]:
+	"""Read the API key list from *path* once per process.
+
+	Every cog that talks to the API needs the same keys; caching the parsed
+	result avoids re-opening and re-parsing the file on each cog (re)load.
+	Returns an empty tuple when the file is missing or malformed; that result
+	is not cached, so adding or fixing the file takes effect on the next cog
+	reload.
+	"""
+	try:
+		return _parse_api_keys(path)
+	except Exception:
+		logger.debug("No %s found or failed to parse", path)
+		return ()
+
 
 class APIClient:
 	"""Async API client with retries, exponential backoff and API-key rotation.
 
 	- Supports passing an ordered list of API keys (`api_keys`) which will be rotated
 	  when the server returns rate-limit / auth errors.
-	- Implements retries with exponential backoff for transient errors (5xx, 429, network).
+	- Implements retries with jittered exponential backoff for transient errors (5xx, 429, network).
 	"""
 
 	def __init__(
@@ -23,11 +108,37 @@ class APIClient:
 		timeout: int = 30,
 		headers: Optional[Dict[str, str]] = None,
 		api_keys: Optional[Sequence[str]] = None,
+		batch_window_ms: float = 25.0,
+		max_batch: int = 30,
+		max_concurrent_batches: int = 8,
 	) -> None:
 		self.base_url = base_url.rstrip("/")
 		self._session: Optional[aiohttp.ClientSession] = None
-		self._semaphore = asyncio.Semaphore(concurrency)
-		self._timeout = aiohttp.ClientTimeout(total=timeout)
+		# enforced by the connector's pool in start(); see there
+		self._concurrency = concurrency
+		# No overall deadline: requests queue on the connector's pool (see
+		# start()), and that wait must not eat into the request's budget. The
+		# TCP/TLS connect and each socket read get *timeout* seconds instead.
+		self._timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+		# short-lived response cache for get_cached(): key -> (expires_at, value)
+		self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+		self._cache_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+		# request coalescing for coalesced_get(): procedure -> queued (future, input)
+		self._batch_window = batch_window_ms / 1000.0
+		self._max_batch = max_batch
+		self._coalesce_buffers: Dict[str, list[Tuple[asyncio.Future, Dict[str, Any]]]] = {}
+		self._coalesce_timers: Dict[str, asyncio.TimerHandle] = {}
+		self._coalesce_tasks: set[asyncio.Task] = set()
+		# conditional GET validators: (url, params) -> (expires_at, etag,
+		# last_modified, raw body); only filled for responses that actually carry
+		# ETag / Last-Modified. The body is kept as bytes, which is far smaller
+		# than the decoded tree, and re-parsed on a 304.
+		self._validators: OrderedDict[Tuple[str, str], Tuple[float, Optional[str], Optional[str], bytes]] = OrderedDict()
+		# client-wide cap on batch HTTP requests in flight, shared by every
+		# batch_get caller (citizen refresh, revalidation, coalesced_get)
+		self._batch_sem = asyncio.Semaphore(max_concurrent_batches)
+		# batch response shape learned from the server, see _batch_items()
+		self._batch_mode: Literal["list", "dict-wrap", "unknown"] = "unknown"
 		# fallback headers provided by caller
 		self._base_headers: Dict[str, str] = dict(headers or {})
 
@@ -37,10 +148,42 @@ class APIClient:
 		if self._api_keys:
 			# ensure header contains the active API key
 			self._base_headers["x-api-key"] = self._api_keys[self._key_index]
+		# one read-only header set per key, built once; rotation just picks one
+		self._key_header_templates: list[CIMultiDictProxy] = []
+		for key in self._api_keys:
+			template = CIMultiDict(self._base_headers)
+			template["x-api-key"] = key
+			self._key_header_templates.append(CIMultiDictProxy(template))
+		self._refresh_header_template()
+
+	def _refresh_header_template(self) -> None:
+		"""Point the shared request headers at the active key's template.
+
+		The template is handed to aiohttp by reference on every call (aiohttp
+		copies it internally), so nothing is rebuilt per request or per rotation.
+		"""
+		if self._key_header_templates:
+			self._header_template: Optional[CIMultiDictProxy] = self._key_header_templates[self._key_index]
+		else:
+			self._header_template = (
+				CIMultiDictProxy(CIMultiDict(self._base_headers)) if self._base_headers else None
+			)
 
 	async def start(self) -> None:
 		if self._session is None:
-			self._session = aiohttp.ClientSession(timeout=self._timeout)
+			# one pooled, keep-alive connector for the whole client so repeated
+			# /trpc calls reuse TCP+TLS connections instead of re-handshaking.
+			# Its pool size is also the concurrency gate: requests beyond
+			# `concurrency` wait in aiohttp's own connection queue.
+			connector = aiohttp.TCPConnector(
+				limit=self._concurrency,
+				limit_per_host=self._concurrency,
+				keepalive_timeout=75,
+				ttl_dns_cache=300,
+				enable_cleanup_closed=True,
+				force_close=False,
+			)
+			self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
 			logger.info("APIClient session started")
 
 	async def close(self) -> None:
@@ -54,95 +197,271 @@ class APIClient:
 			return
 		self._key_index = (self._key_index + 1) % len(self._api_keys)
 		self._base_headers["x-api-key"] = self._api_keys[self._key_index]
+		self._refresh_header_template()
 		logger.info("Rotated API key to index %d", self._key_index)
 
 	async def _request(self, method: str, path: str, **kwargs) -> Any:
 		if self._session is None:
 			raise RuntimeError("APIClient not started; call start() first")
 
-		url = f"{self.base_url}{path}"
+		url: Any = f"{self.base_url}{path}"
+		if "?" in path:
+			# caller already built and percent-encoded the query string
+			url = URL(url, encoded=True)
 
 		attempts = 0
 		max_attempts = 5
-		backoff = 1.0
+		backoff = _BACKOFF_BASE
+		# Always pop "headers" (may be None from default args); kwargs is already
+		# a fresh dict for this call, so it is reused across attempts as-is.
+		per_call_headers = kwargs.pop("headers", None)
+		# checked once per call; the retry warnings below format long batch URLs
+		warn = logger.isEnabledFor(logging.WARNING)
+
+		# conditional GET: revalidate a previously tagged response instead of
+		# re-downloading it; a 304 returns the stored value
+		conditional = kwargs.pop("conditional", False)
+		validator_key = (str(url), repr(kwargs.get("params"))) if conditional else None
+		cached = self._validators.get(validator_key) if conditional else None
+		if cached is not None:
+			if cached[0] <= time.monotonic():
+				del self._validators[validator_key]
+				cached = None
+			else:
+				self._validators.move_to_end(validator_key)
+		if cached is not None:
+			per_call_headers = dict(per_call_headers or {})
+			if cached[1]:
+				per_call_headers["If-None-Match"] = cached[1]
+			if cached[2]:
+				per_call_headers["If-Modified-Since"] = cached[2]
 
 		while attempts < max_attempts:
 			attempts += 1
 			try:
-				# merge default headers with per-call headers
-				call_kwargs = dict(kwargs)
-				call_headers = dict(self._base_headers)
-				# Always pop "headers" (may be None from default args) before merging,
-				# so setdefault / direct assignment is never blocked by a None value.
-				per_call_headers = call_kwargs.pop("headers", None)
+				# the template is rebuilt on key rotation, so re-read it per attempt;
+				# only merge into a new mapping when the caller passed extra headers
+				headers = self._header_template
 				if per_call_headers:
-					call_headers.update(per_call_headers)
-				if call_headers:
-					call_kwargs["headers"] = call_headers
-
-				async with self._semaphore:
-					async with self._session.request(method, url, **call_kwargs) as resp:
-						status = resp.status
-						# success
-						if 200 <= status < 300:
+					headers = CIMultiDict(headers or ())
+					headers.update(per_call_headers)
+				kwargs["headers"] = headers
+
+				async with self._session.request(method, url, **kwargs) as resp:
+					status = resp.status
+					if status == 304 and cached is not None:
+						return self._decode_body(cached[3])
+					# success
+					if 200 <= status < 300:
+						# parse the raw body bytes directly; resp.json() would first
+						# decode the whole (often large batch) body into a str copy
+						body = await resp.read()
+						value: Any = None
+						if body.strip():
 							try:
-								return await resp.json()
-							except Exception:
-								return await resp.text()
-
-						# handle rate limiting: respect Retry-After if provided
-						if status == 429:
-							retry_after = None
-							try:
-								ra = resp.headers.get("Retry-After")
-								if ra is not None:
-									retry_after = float(ra)
-							except Exception:
-								retry_after = None
-
+								value = json_utils.loads(body)
+							except ValueError:
+								value = await resp.text()
+						if conditional:
+							etag = resp.headers.get("ETag")
+							last_modified = resp.headers.get("Last-Modified")
+							if etag or last_modified:
+								self._remember_validator(validator_key, etag, last_modified, body)
+						return value
+
+					# handle rate limiting: respect Retry-After if provided
+					if status == 429:
+						retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+
+						if warn:
 							logger.warning("Rate limited on %s (429). Retry-after=%s attempt %d/%d", url, retry_after, attempts, max_attempts)
-							# rotate key if available
-							if self._api_keys:
-								self._rotate_key()
-							# wait either server-specified time or backoff
-							await asyncio.sleep(retry_after if retry_after is not None else backoff)
-							backoff = min(backoff * 2, 30.0)
+						# rotate key if available
+						if self._api_keys:
+							self._rotate_key()
+						# wait either server-specified time (plus a little jitter) or backoff
+						backoff = _next_backoff(backoff)
+						await asyncio.sleep(
+							retry_after + _rng.uniform(0, 0.5) if retry_after is not None else backoff
+						)
+						if attempts < max_attempts:
+							continue
+						# fallthrough to raise after loop
+
+					# rotate on auth failures and retry once
+					if status in (401, 403):
+						if warn:
+							logger.warning("Auth error %s on %s - rotating key if possible", status, url)
+						if self._api_keys:
+							self._rotate_key()
+							await asyncio.sleep(0.5)
 							if attempts < max_attempts:
 								continue
-							# fallthrough to raise after loop
 
-						# rotate on auth failures and retry once
-						if status in (401, 403):
-							logger.warning("Auth error %s on %s - rotating key if possible", status, url)
-							if self._api_keys:
-								self._rotate_key()
-								await asyncio.sleep(0.5)
-								if attempts < max_attempts:
-									continue
-
-						# retry on server errors
-						if 500 <= status < 600 and attempts < max_attempts:
-							logger.warning("Server error %s on %s - retrying after %s seconds", status, url, backoff)
-							await asyncio.sleep(backoff)
-							backoff = min(backoff * 2, 30.0)
-							continue
+					# retry on server errors
+					if 500 <= status < 600 and attempts < max_attempts:
+						backoff = _next_backoff(backoff)
+						if warn:
+							logger.warning("Server error %s on %s - retrying after %.1f seconds", status, url, backoff)
+						await asyncio.sleep(backoff)
+						continue
 
-						# otherwise raise the status error
-						resp.raise_for_status()
+					# otherwise raise the status error
+					resp.raise_for_status()
 			except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-				logger.warning("API request error %s - attempt %d/%d", str(e), attempts, max_attempts)
+				if warn:
+					logger.warning("API request error %s - attempt %d/%d", e, attempts, max_attempts)
 				if attempts < max_attempts:
+					backoff = _next_backoff(backoff)
 					await asyncio.sleep(backoff)
-					backoff = min(backoff * 2, 30.0)
 					continue
 				raise
 
+	@staticmethod
+	def _decode_body(body: bytes) -> Any:
+		"""Parse a stored response body the way ``_request`` parses a live one."""
+		if not body.strip():
+			return None
+		try:
+			return json_utils.loads(body)
+		except ValueError:
+			return body.decode("utf-8", errors="replace")
+
+	def _remember_validator(self, key: Tuple[str, str], etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+		"""Store a response's validators, evicting the least recently used beyond ``MAX_VALIDATORS``."""
+		self._validators[key] = (time.monotonic() + VALIDATOR_TTL, etag, last_modified, body)
+		self._validators.move_to_end(key)
+		while len(self._validators) > MAX_VALIDATORS:
+			self._validators.popitem(last=False)
+
 	async def get(self, path: str, params: Optional[Dict[str, Any]] = None, json: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
 		return await self._request("GET", path, params=params, json=json, headers=headers)
 
+	async def get_cached(self, path: str, params: Optional[Dict[str, Any]] = None, ttl: float = 30.0) -> Any:
+		"""``get()`` with an in-process TTL cache keyed on *path* and *params*.
+
+		Concurrent callers for the same key wait on one in-flight request
+		instead of each issuing their own. Errors are not cached.
+
+		The returned value is the cached object itself, shared by every caller
+		until it expires: treat it as read-only and copy before mutating.
+		"""
+		key = (path, _json.dumps(params, sort_keys=True) if params else "")
+		hit = self._cache.get(key)
+		if hit is not None and hit[0] > time.monotonic():
+			return hit[1]
+		lock = self._cache_locks.setdefault(key, asyncio.Lock())
+		async with lock:
+			hit = self._cache.get(key)
+			if hit is not None and hit[0] > time.monotonic():
+				return hit[1]
+			value = await self.get(path, params=params)
+			now = time.monotonic()
+			self._prune_cache(now)
+			self._cache[key] = (now + ttl, value)
+			return value
+
+	def _prune_cache(self, now: float) -> None:
+		"""Drop expired get_cached() entries, and their locks unless a fetch holds them."""
+		for key in [k for k, (expires_at, _) in self._cache.items() if expires_at <= now]:
+			del self._cache[key]
+		for key in [k for k, lock in self._cache_locks.items() if k not in self._cache and not lock.locked()]:
+			del self._cache_locks[key]
+
+	async def coalesced_get(self, procedure: str, input_obj: Dict[str, Any]) -> Any:
+		"""Call one tRPC *procedure*, batching with concurrent calls to the same one.
+
+		Calls arriving within ``batch_window_ms`` of each other (or until
+		``max_batch`` are queued) are sent as a single ``batch_get`` request.
+		Returns the unwrapped result, or None if that item failed.
+		"""
+		loop = asyncio.get_running_loop()
+		fut: asyncio.Future = loop.create_future()
+		buf = self._coalesce_buffers.setdefault(procedure, [])
+		buf.append((fut, input_obj))
+		if len(buf) >= self._max_batch:
+			self._flush_coalesced(procedure)
+		elif len(buf) == 1:
+			self._coalesce_timers[procedure] = loop.call_later(
+				self._batch_window, self._flush_coalesced, procedure
+			)
+		return await fut
+
+	def _flush_coalesced(self, procedure: str) -> None:
+		timer = self._coalesce_timers.pop(procedure, None)
+		if timer is not None:
+			timer.cancel()
+		buf = self._coalesce_buffers.pop(procedure, None)
+		if not buf:
+			return
+		task = asyncio.create_task(self._dispatch_coalesced(procedure, buf))
+		self._coalesce_tasks.add(task)
+		task.add_done_callback(self._coalesce_tasks.discard)
+
+	async def _dispatch_coalesced(self, procedure: str, buf: list[Tuple[asyncio.Future, Dict[str, Any]]]) -> None:
+		try:
+			results = await self.batch_get(
+				procedure, [inp for _, inp in buf], batch_size=self._max_batch
+			)
+		except Exception as exc:
+			for fut, _ in buf:
+				if not fut.done():
+					fut.set_exception(exc)
+			return
+		for (fut, _), result in zip(buf, results):
+			if not fut.done():
+				fut.set_result(result)
+
 	async def post(self, path: str, json: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Any:
 		return await self._request("POST", path, json=json, headers=headers)
 
+	@staticmethod
+	def normalize_list(
+		payload: Any,
+		list_keys: Sequence[str] = ("data", "countries", "items"),
+	) -> list[Dict[str, Any]]:
+		"""Unwrap a list of dicts from the usual API envelopes.
+
+		Accepts a bare list, a tRPC ``result.data`` list, or a list stored under
+		any of *list_keys* at the root. Non-dict entries are dropped; anything
+		else yields an empty list.
+		"""
+		if isinstance(payload, list):
+			return [x for x in payload if isinstance(x, dict)]
+		if not isinstance(payload, dict):
+			return []
+		result = payload.get("result")
+		if isinstance(result, dict):
+			data = result.get("data")
+			if isinstance(data, list):
+				return [x for x in data if isinstance(x, dict)]
+		for key in list_keys:
+			v = payload.get(key)
+			if isinstance(v, list):
+				return [x for x in v if isinstance(x, dict)]
+		return []
+
+	def _batch_items(self, resp: Any, count: int) -> Optional[list[Any]]:
+		"""Return the *count* per-item entries of a batch response, or None.
+
+		Most tRPC servers answer a batch with a list; some wrap it as
+		``{"0": ..., "1": ...}``. The shape seen last is tried first, and a
+		mismatch simply re-probes both.
+		"""
+		if self._batch_mode == "dict-wrap" and isinstance(resp, dict):
+			try:
+				return [resp[str(i)] for i in range(count)]
+			except KeyError:
+				pass
+		if isinstance(resp, list) and len(resp) == count:
+			self._batch_mode = "list"
+			return resp
+		if isinstance(resp, dict) and len(resp) == count and all(str(i) in resp for i in range(count)):
+			if self._batch_mode != "dict-wrap":
+				logger.info("batch_get: server returns dict-wrapped batch responses")
+			self._batch_mode = "dict-wrap"
+			return [resp[str(i)] for i in range(count)]
+		return None
+
 	@staticmethod
 	def _unwrap_trpc_batch_item(item: Any) -> Any:
 		"""Extract the data payload from one tRPC batch response element."""
@@ -159,63 +478,122 @@ class APIClient:
 	async def batch_get(
 		self,
 		procedure: str,
-		inputs: list[Dict[str, Any]],
+		inputs: Sequence[Dict[str, Any] | str],
 		*,
 		batch_size: int = 30,
-		chunk_sleep: float = 1.0,
+		max_parallel_batches: int = 4,
+		max_fallback_parallelism: int = 5,
+		conditional: bool = False,
 	) -> list[Any]:
 		"""Call one tRPC procedure for many inputs using tRPC HTTP batching.
 
 		Each chunk of up to *batch_size* inputs is sent as a single HTTP request:
 			GET /proc,proc,...?batch=1&input={"0":{...},"1":{...},...}
-		If the server doesn't return a list of the right length the whole chunk
-		falls back to individual ``get()`` calls automatically.
+		If the server doesn't return a list (or an index-keyed dict) of the right
+		length the whole chunk falls back to individual ``get()`` calls. A chunk
+		whose URL would exceed ``MAX_URL_LENGTH`` is split in half until it fits.
 
-		Returns a flat list of unwrapped results in the same order as *inputs*.
-		*chunk_sleep* seconds are awaited between HTTP requests.
-		"""
-		proc = procedure.lstrip("/")
-		all_results: list[Any] = []
+		Up to *max_parallel_batches* chunks of this call are in flight at once
+		(and at most ``max_concurrent_batches`` across all callers), and up to
+		*max_fallback_parallelism* individual fallback calls; rate limits are
+		handled by the retry/backoff logic in ``_request``.
 
-		for chunk_start in range(0, len(inputs), batch_size):
-			if chunk_start > 0 and chunk_sleep > 0:
-				await asyncio.sleep(chunk_sleep)
+		With *conditional*, chunks whose previous response carried an ETag or
+		Last-Modified are revalidated and a 304 reuses the stored result.
 
-			chunk = inputs[chunk_start : chunk_start + batch_size]
-			path = "/" + ",".join(proc for _ in chunk)
-			input_map = {str(j): inp for j, inp in enumerate(chunk)}
-			params = {"batch": "1", "input": _json.dumps(input_map)}
+		Inputs may be dicts or already-serialized JSON strings; the latter are
+		spliced into the batch input map without another encoder pass.
 
-			chunk_results: list[Any] | None = None
-			try:
-				resp = await self._request("GET", path, params=params)
-				if isinstance(resp, list) and len(resp) == len(chunk):
-					chunk_results = [self._unwrap_trpc_batch_item(item) for item in resp]
-				else:
+		Returns a flat list of unwrapped results in the same order as *inputs*.
+		"""
+		proc = procedure.lstrip("/")
+		chunks = [inputs[i : i + batch_size] for i in range(0, len(inputs), batch_size)]
+		gate = asyncio.Semaphore(max_parallel_batches)
+
+		async def _do_chunk(chunk_idx: int, chunk: Sequence[Dict[str, Any] | str]) -> list[Any] | None:
+			if isinstance(chunk[0], str):
+				input_json = "{" + ",".join(f'"{j}":{inp}' for j, inp in enumerate(chunk)) + "}"
+			else:
+				input_json = json_utils.dumps({str(j): inp for j, inp in enumerate(chunk)})
+			# encode the query once here instead of letting aiohttp re-quote params
+			path = _batch_path(proc, len(chunk)) + "?batch=1&input=" + quote(input_json, safe="")
+			if len(self.base_url) + len(path) > MAX_URL_LENGTH:
+				if len(chunk) == 1:
 					logger.warning(
-						"batch_get: unexpected response shape for chunk %d (got %s), falling back",
-						chunk_start // batch_size,
-						type(resp).__name__,
+						"batch_get: chunk %d URL too long (%d chars) for a single input, falling back",
+						chunk_idx,
+						len(self.base_url) + len(path),
 					)
+					return None
+				# halve until each part fits the URL budget; a failed half falls
+				# back on its own instead of taking the other half with it
+				mid = len(chunk) // 2
+				halves = (chunk[:mid], chunk[mid:])
+				parts = await asyncio.gather(*(_do_chunk(chunk_idx, h) for h in halves))
+				out: list[Any] = []
+				for half, part in zip(halves, parts):
+					out.extend(part if part is not None else await _do_fallback(half))
+				return out
+			try:
+				async with gate, self._batch_sem:
+					resp = await self._request("GET", path, conditional=conditional)
 			except Exception as exc:
 				logger.warning(
 					"batch_get: batch of %d failed (%s), falling back to individual calls",
 					len(chunk),
 					exc,
 				)
+				return None
+			items = self._batch_items(resp, len(chunk))
+			if items is not None:
+				# inlined _unwrap_trpc_batch_item: this runs once per citizen
+				out = []
+				append = out.append
+				for item in items:
+					if type(item) is not dict:
+						append(item)
+						continue
+					result = item.get("result")
+					if type(result) is dict:
+						data = result.get("data")
+						append(data if data is not None else result)
+					else:
+						append(None if "error" in item else item)
+				return out
+			logger.warning(
+				"batch_get: unexpected response shape for chunk %d (got %s), falling back",
+				chunk_idx,
+				type(resp).__name__,
+			)
+			return None
 
-			if chunk_results is None:
-				chunk_results = []
-				for inp in chunk:
-					try:
-						result = await self._request("GET", f"/{proc}", params={"input": _json.dumps(inp)})
-						chunk_results.append(result)
-					except Exception:
-						chunk_results.append(None)
-					await asyncio.sleep(0.3)
+		fallback_gate = asyncio.Semaphore(max_fallback_parallelism)
 
-			all_results.extend(chunk_results)
+		async def _do_single(inp: Dict[str, Any] | str) -> Any:
+			# no fixed sleep here: _request already backs off on 429/5xx
+			async with fallback_gate:
+				try:
+					encoded = inp if isinstance(inp, str) else json_utils.dumps(inp)
+					resp = await self._request("GET", f"/{proc}", params={"input": encoded})
+				except Exception:
+					return None
+				# same shape as the batch path: the single-call envelope is {"result": {"data": ...}}
+				return self._unwrap_trpc_batch_item(resp)
+
+		async def _do_fallback(chunk: Sequence[Dict[str, Any] | str]) -> list[Any]:
+			return list(await asyncio.gather(*(_do_single(inp) for inp in chunk)))
+
+		results = await asyncio.gather(*(_do_chunk(i, c) for i, c in enumerate(chunks)))
 
+		failed = [i for i, r in enumerate(results) if r is None]
+		if failed:
+			fallbacks = await asyncio.gather(*(_do_fallback(chunks[i]) for i in failed))
+			for i, r in zip(failed, fallbacks):
+				results[i] = r
+
+		all_results: list[Any] = []
+		for chunk_results in results:
+			all_results.extend(chunk_results)
 		return all_results
 
 
@@ -1,88 +1,338 @@
 """Handles fetching and caching citizen level data from the WarEra API."""
 
-import json
+import asyncio
 import logging
-from datetime import datetime
-from typing import Any
-
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, NamedTuple
+
+from services import json_utils
 from services.api_client import APIClient
 from services.db import Database
 
 logger = logging.getLogger("discord_bot")
 
+_ECO_SKILLS = frozenset({"entrepreneurship", "energy", "production", "companies", "management"})
+_WAR_SKILLS = frozenset({"attack", "health", "hunger", "criticalChance", "criticalDamages",
+                         "armor", "precision", "dodge", "lootChance"})
+# skill name → sign used by _skill_mode (+1 = eco, -1 = war)
+_SKILL_SIGN: dict[str, int] = {n: 1 for n in _ECO_SKILLS} | {n: -1 for n in _WAR_SKILLS}
+
+# MU id in an embed description link, e.g. "(https://app.warera.io/mu/695c1013…)"
+_MU_URL_RE = re.compile(r'/mu/([a-f0-9]+)')
+
+# Key paths probed in order by the _extract_* helpers. Built once at import so
+# each extraction is a flat loop of dict lookups.
+_LEVEL_PATHS: tuple[tuple[str, ...], ...] = (
+    ("leveling", "level"), ("level",), ("rankings", "userLevel", "value"),
+)
+_NAME_PATHS: tuple[tuple[str, ...], ...] = (
+    *((k,) for k in ("name", "username", "displayName", "nick")),
+    *((sub, k) for sub in ("profile", "user") for k in ("name", "username", "displayName")),
+)
+_LOGIN_KEYS = ("lastLoginAt", "lastSeenAt", "lastOnlineAt", "lastActiveAt", "lastLogin")
+_LOGIN_PATHS: tuple[tuple[str, ...], ...] = (
+    *(("dates", k) for k in _LOGIN_KEYS),
+    *((k,) for k in _LOGIN_KEYS),
+)
+
+
+_EMPTY: dict = {}
+
+
+def _dig(obj: Any, path: tuple[str, ...]) -> Any:
+    """Follow *path* through nested dicts; None if any step is missing or not a dict."""
+    for key in path:
+        try:
+            obj = obj.get(key)
+        except AttributeError:
+            return None
+    return obj
+
 
-class CitizenCache:
-    """Fetches citizen level data from the API and persists it to the DB cache."""
+def _skill_mode(skills: dict) -> str:
+    """Classify a ``skills`` dict as 'eco' or 'war' (see _extract_skill_mode)."""
+    score = 0  # eco points minus war points
+    for name, sdata in skills.items():
+        sign = _SKILL_SIGN.get(name)
+        if sign is None or not isinstance(sdata, dict):
+            continue
+        lv = int(sdata.get("level") or 0)
+        score += sign * (lv * (lv + 1) // 2)
+    return "eco" if score >= 0 else "war"
+
+
+def _user_input(uid: str) -> str:
+    """Pre-serialized getUserLite input; avoids a dict per citizen in batch_get."""
+    return '{"userId":' + json_utils.dumps(uid) + '}'
+
+
+def _first_str(obj: Any, paths: tuple[tuple[str, ...], ...]) -> str | None:
+    """Return the first non-empty string found along *paths*."""
+    for path in paths:
+        val = _dig(obj, path)
+        if isinstance(val, str) and val:
+            return val
+    return None
+
+# mus.json path → (mtime_ns, parsed (mu_id, mu_name) entries); see _load_mu_entries
+_mus_cache: dict[str, tuple[int, list[tuple[str, str]]]] = {}
+
+
+def _load_mu_entries(mus_json_path: str) -> list[tuple[str, str]] | None:
+    """Return ``(mu_id, mu_name)`` pairs from mus.json, re-parsing only when it changes.
+
+    Returns None if the file can't be read or has no embeds.
+    """
+    try:
+        mtime = os.stat(mus_json_path).st_mtime_ns
+        cached = _mus_cache.get(mus_json_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(mus_json_path, "rb") as f:
+            mus_data = json_utils.loads(f.read())
+    except Exception as exc:
+        logger.warning("refresh_mu_memberships: failed to load %s: %s", mus_json_path, exc)
+        return None
+
+    embeds = mus_data.get("embeds", [])
+    if not embeds:
+        return None
+
+    # Extract mu_id from the URL in each embed's description
+    # e.g. "[**Elite MU**](https://app.warera.io/mu/695c10139cddbde0503e0d36)"
+    mu_entries: list[tuple[str, str]] = []
+    for embed in embeds:
+        title = embed.get("title", "?")
+        description = embed.get("description", "")
+        m = _MU_URL_RE.search(description)
+        if m:
+            mu_entries.append((m.group(1), title))
+    _mus_cache[mus_json_path] = (mtime, mu_entries)
+    return mu_entries
+
+
+class UserLite(NamedTuple):
+    """The citizen_levels fields parsed from one getUserLite result.
+
+    A tuple subclass, so it concatenates straight into a DB row while the
+    refresh loop can still use attribute access.
+    """
+
+    level: int | None
+    skill_mode: str | None
+    last_skills_reset_at: str | None
+    citizen_name: str | None
+    last_login_at: str | None
+    mu_id: str | None
+    mu_name: str | None
+
+
+_NO_USER = UserLite(None, None, None, None, None, None, None)
 
-    def __init__(self, client: APIClient, db: Database) -> None:
+
+class CitizenCache:
+    """Fetches citizen level data from the API and persists it to the DB cache.
+
+    Extracted getUserLite fields are kept in memory per user. Within
+    *user_ttl* seconds a cached entry is reused as-is; up to *stale_window*
+    seconds it is still served immediately but re-fetched in the background
+    (stale-while-revalidate). Older entries are fetched inline and dropped
+    from memory, which holds at most *max_users* entries.
+    """
+
+    def __init__(
+        self,
+        client: APIClient,
+        db: Database,
+        *,
+        user_ttl: float = 3600.0,
+        stale_window: float = 6 * 3600.0,
+        sweep_lock: asyncio.Lock | None = None,
+        max_users: int = 200_000,
+    ) -> None:
         self._client = client
         self._db = db
+        self._user_ttl = user_ttl
+        self._stale_window = stale_window
+        self._max_users = max_users
+        # user_id → (monotonic fetch time, row fields from level to updated_at),
+        # oldest write first; see _cache_user
+        self._user_cache: OrderedDict[str, tuple[float, tuple]] = OrderedDict()
+        self._revalidate_tasks: set[asyncio.Task] = set()
+        # country_ids with a background revalidation in flight
+        self._revalidating: set[str] = set()
+        # Held by heavy API sweeps; revalidation queues behind them instead of
+        # competing for the same rate budget.
+        self._sweep_lock = sweep_lock or asyncio.Lock()
 
     # ------------------------------------------------------------------ #
     # Public interface                                                     #
     # ------------------------------------------------------------------ #
 
-    async def refresh_country(self, country_id: str, country_name: str, *, progress_msg=None) -> int:
+    async def refresh_country(
+        self,
+        country_id: str,
+        country_name: str,
+        *,
+        progress_msg=None,
+        hard_refresh: bool = False,
+    ) -> int:
         """Fetch every citizen's level for a country and write to DB cache.
 
-        Uses tRPC HTTP batching (30 users per request) with automatic fallback
-        to individual calls if the server doesn't support batching.
+        User IDs are streamed page by page and fetched in tRPC HTTP batches
+        (100 users per request, a few requests in flight at once) while
+        pagination continues, with automatic fallback to individual calls if
+        the server doesn't support batching. Recently fetched citizens are
+        served from the in-memory cache unless *hard_refresh* is set.
 
         Returns the number of citizens whose level was successfully recorded.
         """
-        user_ids = await self._fetch_user_ids(country_id)
-        if not user_ids:
-            return 0
-
-        await self._db.delete_citizens_for_country(country_id)
-
-        updated_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        updated_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        now = time.monotonic()
         batch_size = 100
-        inputs = [{"userId": uid} for uid in user_ids]
-        total_batches = (len(user_ids) + batch_size - 1) // batch_size
-
-        results = await self._client.batch_get(
-            "/user.getUserLite",
-            inputs,
-            batch_size=batch_size,
-            chunk_sleep=0.5,
-        )
-
+        stale: list[str] = []
         recorded = 0
-        for i, (uid, obj) in enumerate(zip(user_ids, results)):
-            lvl = self._extract_level(obj)
-            mode = self._extract_skill_mode(obj)
-            reset_at = self._extract_last_skills_reset_at(obj)
-            last_login = self._extract_last_login_at(obj)
-            name = self._extract_name(obj)
-            mu_id, mu_name = self._extract_mu_info(obj)
-            if lvl is not None:
-                await self._db.upsert_citizen_level(
-                    uid, country_id, lvl, updated_at,
-                    skill_mode=mode, last_skills_reset_at=reset_at,
-                    citizen_name=name, last_login_at=last_login,
-                    mu_id=mu_id, mu_name=mu_name,
+        fetched = 0
+        batches_done = 0
+        started = False
+
+        # Rows go through a queue to a single writer task, so decoding the next
+        # batch never waits on SQLite; None marks the end of the stream.
+        rows: asyncio.Queue[tuple | None] = asyncio.Queue(maxsize=1024)
+
+        async def flusher() -> None:
+            buf: list[tuple] = []
+            error: Exception | None = None
+            while (row := await rows.get()) is not None:
+                if error is not None:
+                    continue  # keep draining so producers never block on a dead writer
+                buf.append(row)
+                if len(buf) >= batch_size * 5:
+                    try:
+                        await self._db.bulk_upsert_citizen_levels(buf)
+                    except Exception as exc:
+                        error = exc
+                    buf.clear()
+            if error is not None:
+                raise error
+            await self._db.bulk_upsert_citizen_levels(buf)
+
+        writer = asyncio.create_task(flusher())
+
+        # IDs stream in page by page; each full chunk of uncached IDs becomes
+        # a getUserLite batch task while pagination carries on.
+        chunk: list[str] = []
+        in_flight: set[asyncio.Task] = set()
+        gate = asyncio.Semaphore(4)
+
+        async def fetch_chunk(ids: list[str]) -> tuple[list[str], list[Any]]:
+            async with gate:
+                return ids, await self._client.batch_get(
+                    "/user.getUserLite",
+                    [_user_input(uid) for uid in ids],
+                    batch_size=batch_size,
+                    conditional=not hard_refresh,
                 )
-                recorded += 1
 
-            if (i + 1) % (batch_size * 2) == 0:
-                await self._db.flush_citizen_levels()
-                if progress_msg:
-                    batch_done = (i + 1) // batch_size
-                    try:
-                        await progress_msg.edit(
-                            content=(
-                                f"Refreshing **{country_name}**: "
-                                f"batch {batch_done}/{total_batches} "
-                                f"({i + 1}/{len(user_ids)} citizens)…"
-                            )
-                        )
-                    except Exception:
-                        pass
-
-        await self._db.flush_citizen_levels()
+        last_edit = 0.0
+        edit_tasks: set[asyncio.Task] = set()
+
+        def _finish_edit(task: asyncio.Task) -> None:
+            edit_tasks.discard(task)
+            if not task.cancelled():
+                task.exception()  # progress edits are best effort
+
+        async def collect(done: set[asyncio.Task]) -> None:
+            nonlocal recorded, fetched, batches_done, last_edit
+            for task in done:
+                in_flight.discard(task)
+                ids, results = task.result()
+                for uid, obj in zip(ids, results):
+                    fields = self._row_fields(obj, updated_at)
+                    if fields is not None:
+                        self._cache_user(uid, now, fields)
+                        await rows.put((uid, country_id) + fields)
+                        recorded += 1
+                fetched += len(ids)
+                batches_done += 1
+            # Discord edits are rate limited: at most one every 2s, and off
+            # the critical path so fetching and DB writes don't wait on them
+            if progress_msg and time.monotonic() - last_edit >= 2.0:
+                last_edit = time.monotonic()
+                task = asyncio.create_task(progress_msg.edit(
+                    content=(
+                        f"Refreshing **{country_name}**: "
+                        f"batch {batches_done} "
+                        f"({fetched} citizens fetched)…"
+                    )
+                ))
+                edit_tasks.add(task)
+                task.add_done_callback(_finish_edit)
+
+        try:
+            async for uid in self._iter_user_ids(country_id):
+                started = True
+                hit = None if hard_refresh else self._user_cache.get(uid)
+                age = now - hit[0] if hit is not None else None
+                if age is None or age > self._stale_window:
+                    chunk.append(uid)
+                    if len(chunk) >= batch_size:
+                        in_flight.add(asyncio.create_task(fetch_chunk(chunk)))
+                        chunk = []
+                        done = {t for t in in_flight if t.done()}
+                        if done:
+                            await collect(done)
+                    continue
+                # re-stamp with this run's updated_at so the sweep below keeps it
+                await rows.put((uid, country_id) + hit[1][:-1] + (updated_at,))
+                recorded += 1
+                if age > self._user_ttl:
+                    stale.append(uid)
+
+            if chunk:
+                in_flight.add(asyncio.create_task(fetch_chunk(chunk)))
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                await collect(done)
+            await rows.put(None)
+            await writer
+        finally:
+            for task in in_flight:
+                task.cancel()
+            writer.cancel()
+            # a late progress edit must not overwrite the caller's final message
+            pending_edits = list(edit_tasks)
+            for task in pending_edits:
+                task.cancel()
+            await asyncio.gather(*pending_edits, return_exceptions=True)
+
+        if not started:
+            return 0
+        # mark-and-sweep: every citizen still in the country was just upserted
+        # with this run's updated_at; anything older has left the country
+        removed = await self._db.delete_stale_citizens(country_id, updated_at)
+        if removed:
+            logger.debug("refresh_country: %s → removed %d departed citizens", country_name, removed)
+
+        if stale and country_id not in self._revalidating:
+            self._revalidating.add(country_id)
+            task = asyncio.create_task(self._revalidate(country_id, stale))
+            self._revalidate_tasks.add(task)
+            task.add_done_callback(self._revalidate_tasks.discard)
+            task.add_done_callback(lambda _t: self._revalidating.discard(country_id))
         return recorded
 
+    async def close(self) -> None:
+        """Cancel and wait for any background revalidations still running."""
+        tasks = list(self._revalidate_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     async def refresh_mu_memberships(self, country_id: str, mus_json_path: str) -> int:
         """Fetch MU member lists from the API and write mu_id/mu_name to citizen_levels.
 
@@ -94,51 +344,80 @@ class CitizenCache:
 
         Returns the number of citizen rows updated.
         """
-        # Load MU list from mus.json
-        try:
-            with open(mus_json_path, encoding="utf-8") as f:
-                mus_data = json.load(f)
-        except Exception as exc:
-            logger.warning("refresh_mu_memberships: failed to load %s: %s", mus_json_path, exc)
+        mu_entries = _load_mu_entries(mus_json_path)
+        if mu_entries is None:
             return 0
-
-        embeds = mus_data.get("embeds", [])
-        if not embeds:
-            return 0
-
-        # Extract mu_id from the URL in each embed's description
-        # e.g. "[**Elite MU**](https://app.warera.io/mu/695c10139cddbde0503e0d36)"
-        import re
-        mu_entries: list[tuple[str, str]] = []  # (mu_id, mu_name)
-        for embed in embeds:
-            title = embed.get("title", "?")
-            description = embed.get("description", "")
-            m = re.search(r'/mu/([a-f0-9]+)', description)
-            if m:
-                mu_entries.append((m.group(1), title))
-
         if not mu_entries:
             logger.warning("refresh_mu_memberships: no MU IDs found in %s", mus_json_path)
             return 0
 
+        # Fetch every MU's roster concurrently (bounded so we don't trip rate limits)
+        sem = asyncio.Semaphore(8)
+
+        async def fetch_one(mu_id: str) -> list[str]:
+            async with sem:
+                return await self._fetch_mu_member_ids(mu_id)
+
+        rosters = await asyncio.gather(*(fetch_one(mu_id) for mu_id, _ in mu_entries))
+
         # Reset all MU assignments for this country first
         await self._db.clear_citizen_mus_for_country(country_id)
 
-        updated = 0
-        for mu_id, mu_name in mu_entries:
-            member_ids = await self._fetch_mu_member_ids(mu_id)
+        # uid → (mu_id, mu_name); later MUs in mus.json win, as before
+        assignments: dict[str, tuple[str, str]] = {}
+        for (mu_id, mu_name), member_ids in zip(mu_entries, rosters):
             for uid in member_ids:
-                await self._db.update_citizen_mu(uid, mu_id, mu_name)
-                updated += 1
-            await self._db.flush_citizen_levels()
+                assignments[uid] = (mu_id, mu_name)
             logger.debug("refresh_mu_memberships: %s → %d members", mu_name, len(member_ids))
 
-        return updated
+        return await self._db.bulk_update_citizen_mus(assignments, country_id)
 
     # ------------------------------------------------------------------ #
     # Private helpers                                                      #
     # ------------------------------------------------------------------ #
 
+    def _cache_user(self, uid: str, fetched_at: float, fields: tuple) -> None:
+        """Store *fields* for *uid*, evicting entries past the stale window or over the size cap."""
+        cache = self._user_cache
+        cache[uid] = (fetched_at, fields)
+        cache.move_to_end(uid)
+        # writes arrive in fetch order, so expired entries sit at the front
+        cutoff = time.monotonic() - self._stale_window
+        while cache:
+            oldest_uid, (oldest_at, _) = next(iter(cache.items()))
+            if oldest_at >= cutoff and len(cache) <= self._max_users:
+                break
+            del cache[oldest_uid]
+
+    def _row_fields(self, obj: Any, updated_at: str) -> tuple | None:
+        """Extract the cached citizen_levels fields (level … updated_at) from a getUserLite result."""
+        user = self._extract_all(obj)
+        if user.level is None:
+            return None
+        return user + (updated_at,)
+
+    async def _revalidate(self, country_id: str, user_ids: list[str]) -> None:
+        """Background re-fetch of stale cache entries served by refresh_country."""
+        try:
+            async with self._sweep_lock:
+                results = await self._client.batch_get(
+                    "/user.getUserLite",
+                    [_user_input(uid) for uid in user_ids],
+                    batch_size=100,
+                )
+            now = time.monotonic()
+            updated_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            rows: list[tuple] = []
+            for uid, obj in zip(user_ids, results):
+                fields = self._row_fields(obj, updated_at)
+                if fields is not None:
+                    self._cache_user(uid, now, fields)
+                    rows.append((uid, country_id) + fields)
+            await self._db.bulk_upsert_citizen_levels(rows)
+            logger.debug("citizen revalidate: %s → %d/%d refreshed", country_id, len(rows), len(user_ids))
+        except Exception:
+            logger.exception("citizen revalidate failed for %s", country_id)
+
     async def _fetch_mu_member_ids(self, mu_id: str) -> list[str]:
         """Paginate /mu.getById and return all member user IDs for a given MU."""
         user_ids: list[str] = []
@@ -146,20 +425,14 @@ class CitizenCache:
         try:
             resp = await self._client.get(
                 "/mu.getById",
-                params={"input": json.dumps({"muId": mu_id})},
+                params={"input": json_utils.dumps({"muId": mu_id})},
             )
         except Exception as exc:
             logger.warning("_fetch_mu_member_ids(%s): request failed: %s", mu_id, exc)
             return user_ids
 
         # Navigate the response to find the members list
-        data = resp
-        if isinstance(resp, dict):
-            for key in ("result", "data"):
-                v = resp.get(key)
-                if isinstance(v, dict):
-                    data = v.get("data", v)
-                    break
+        data = self._unwrap(resp)
 
         members: list = []
         if isinstance(data, dict):
@@ -184,73 +457,133 @@ class CitizenCache:
 
         return user_ids
 
-    async def _fetch_user_ids(self, country_id: str) -> list[str]:
-        """Paginate /user.getUsersByCountry and return all user IDs."""
-        user_ids: list[str] = []
-        cursor = None
-        while True:
+    async def _iter_user_ids(self, country_id: str) -> AsyncIterator[str]:
+        """Paginate /user.getUsersByCountry, yielding user IDs as pages arrive.
+
+        The cursor is opaque, so pages can't be fetched out of order; instead
+        the next page's request is started as soon as its cursor is known and
+        runs while the current page's users are being consumed. IDs already
+        yielded (overlapping or repeated pages) are skipped.
+        """
+        def fetch_page(cursor: str | None) -> asyncio.Task:
             params: dict = {"countryId": country_id, "limit": 100}
             if cursor:
                 params["cursor"] = cursor
-
-            resp = await self._client.get(
+            return asyncio.create_task(self._client.get(
                 "/user.getUsersByCountry",
-                params={"input": json.dumps(params)},
-            )
+                params={"input": json_utils.dumps(params)},
+            ))
 
-            data_obj = resp
-            if isinstance(resp, dict):
-                for key in ("result", "data"):
-                    v = resp.get(key)
-                    if isinstance(v, dict):
-                        data_obj = v.get("data", v)
-                        break
-
-            users: list = []
-            next_cursor = None
-            if isinstance(data_obj, list):
-                users = data_obj
-            elif isinstance(data_obj, dict):
-                for key in ("items", "users", "data", "result"):
-                    v = data_obj.get(key)
-                    if isinstance(v, list):
-                        users = v
-                        break
-                next_cursor = (
-                    data_obj.get("nextCursor")
-                    or data_obj.get("cursor")
-                    or data_obj.get("next")
+        page: asyncio.Task | None = fetch_page(None)
+        seen: set[str] = set()
+        dupes = 0
+        try:
+            while page is not None:
+                resp = await page
+                page = None
+
+                data_obj = self._unwrap(resp)
+
+                users: list = []
+                next_cursor = None
+                if isinstance(data_obj, list):
+                    users = data_obj
+                elif isinstance(data_obj, dict):
+                    for key in ("items", "users", "data", "result"):
+                        v = data_obj.get(key)
+                        if isinstance(v, list):
+                            users = v
+                            break
+                    next_cursor = (
+                        data_obj.get("nextCursor")
+                        or data_obj.get("cursor")
+                        or data_obj.get("next")
+                    )
+
+                if next_cursor and users:
+                    page = fetch_page(next_cursor)
+
+                for user in users:
+                    if isinstance(user, dict):
+                        uid = user.get("_id") or user.get("id") or user.get("userId")
+                        if not uid:
+                            continue
+                        uid = str(uid)
+                        if uid in seen:
+                            dupes += 1
+                            continue
+                        seen.add(uid)
+                        yield uid
+        finally:
+            if page is not None:
+                page.cancel()
+            if dupes:
+                logger.debug(
+                    "Country %s: dropped %d duplicate user IDs from pagination",
+                    country_id, dupes,
                 )
 
-            for user in users:
-                if isinstance(user, dict):
-                    uid = user.get("_id") or user.get("id") or user.get("userId")
-                    if uid:
-                        user_ids.append(str(uid))
+    @staticmethod
+    def _unwrap(resp: Any) -> Any:
+        """Strip the tRPC ``result.data`` (or bare ``data``) envelope from a response.
 
-            if not next_cursor or not users:
-                break
-            cursor = next_cursor
-        return user_ids
+        Lists and other non-dict payloads are returned unchanged.
+        """
+        if not isinstance(resp, dict):
+            return resp
+        for key in ("result", "data"):
+            v = resp.get(key)
+            if isinstance(v, dict):
+                return v.get("data", v)
+        return resp
+
+    @staticmethod
+    def _extract_all(obj: Any) -> UserLite:
+        """Extract every citizen_levels field from a getUserLite result in one pass.
+
+        Returns a :class:`UserLite` holding the same values the individual
+        ``_extract_*`` helpers produce, but reading ``skills`` and ``dates``
+        once instead of once per helper.
+        """
+        if not isinstance(obj, dict):
+            return _NO_USER
+        level = None
+        for path in _LEVEL_PATHS:
+            val = _dig(obj, path)
+            if val is not None:
+                try:
+                    level = int(val)
+                    break
+                except (TypeError, ValueError):
+                    pass
+        skills = obj.get("skills")
+        mode = _skill_mode(skills) if isinstance(skills, dict) else None
+        dates = obj.get("dates")
+        if not isinstance(dates, dict):
+            dates = _EMPTY
+        reset_at = dates.get("lastSkillsResetAt")
+        if not (isinstance(reset_at, str) and reset_at):
+            reset_at = None
+        last_login = next(
+            (v for d in (dates, obj) for k in _LOGIN_KEYS
+             if isinstance(v := d.get(k), str) and v),
+            None,
+        )
+        mu_id, mu_name = CitizenCache._extract_mu_info(obj)
+        return UserLite(level, mode, reset_at, _first_str(obj, _NAME_PATHS), last_login, mu_id, mu_name)
 
     @staticmethod
     def _extract_level(obj: Any) -> int | None:
         """Pull the level integer out of a getUserLite result dict."""
         if not isinstance(obj, dict):
             return None
-        try:
-            return int(obj["leveling"]["level"])
-        except (KeyError, TypeError, ValueError):
-            pass
-        if obj.get("level") is not None:
-            try:
-                return int(obj["level"])
-            except (ValueError, TypeError):
-                pass
-        try:
-            return int(obj["rankings"]["userLevel"]["value"])
-        except (KeyError, TypeError, ValueError):
-            pass
+        for path in _LEVEL_PATHS:
+            val = _dig(obj, path)
+            if val is not None:
+                try:
+                    return int(val)
+                except (TypeError, ValueError):
+                    pass
         return None
 
     @staticmethod
@@ -269,39 +602,14 @@ class CitizenCache:
         skills = obj.get("skills")
         if not isinstance(skills, dict):
             return None
-        eco_names = {"entrepreneurship", "energy", "production", "companies", "management"}
-        war_names = {"attack", "health", "hunger", "criticalChance", "criticalDamages",
-                     "armor", "precision", "dodge", "lootChance"}
-        eco_pts = 0
-        war_pts = 0
-        for name, sdata in skills.items():
-            if not isinstance(sdata, dict):
-                continue
-            lv = int(sdata.get("level") or 0)
-            pts = lv * (lv + 1) // 2
-            if name in eco_names:
-                eco_pts += pts
-            elif name in war_names:
-                war_pts += pts
-        return "eco" if eco_pts >= war_pts else "war"
+        return _skill_mode(skills)
 
     @staticmethod
     def _extract_name(obj: Any) -> str | None:
         """Pull the player name from a getUserLite result."""
         if not isinstance(obj, dict):
             return None
-        for key in ("name", "username", "displayName", "nick"):
-            val = obj.get(key)
-            if isinstance(val, str) and val:
-                return val
-        for sub in ("profile", "user"):
-            sub_obj = obj.get(sub)
-            if isinstance(sub_obj, dict):
-                for key in ("name", "username", "displayName"):
-                    val = sub_obj.get(key)
-                    if isinstance(val, str) and val:
-                        return val
-        return None
+        return _first_str(obj, _NAME_PATHS)
 
     @staticmethod
     def _extract_last_skills_reset_at(obj: Any) -> str | None:
@@ -312,10 +620,7 @@ class CitizenCache:
         """
         if not isinstance(obj, dict):
             return None
-        dates = obj.get("dates")
-        if not isinstance(dates, dict):
-            return None
-        val = dates.get("lastSkillsResetAt")
+        val = _dig(obj, ("dates", "lastSkillsResetAt"))
         if isinstance(val, str) and val:
             return val
         return None
@@ -361,16 +666,6 @@ class CitizenCache:
         """
         if not isinstance(obj, dict):
             return None
-        # Try nested ``dates`` object first (same location as lastSkillsResetAt)
-        dates = obj.get("dates")
-        if isinstance(dates, dict):
-            for key in ("lastLoginAt", "lastSeenAt", "lastOnlineAt", "lastActiveAt", "lastLogin"):
-                val = dates.get(key)
-                if isinstance(val, str) and val:
-                    return val
-        # Fall back to root-level keys
-        for key in ("lastLoginAt", "lastSeenAt", "lastOnlineAt", "lastActiveAt", "lastLogin"):
-            val = obj.get(key)
-            if isinstance(val, str) and val:
-                return val
-        return None
+        # nested ``dates`` object first (same location as lastSkillsResetAt),
+        # then root-level keys
+        return _first_str(obj, _LOGIN_PATHS)
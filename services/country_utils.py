@@ -1,5 +1,9 @@
 """Utilities for normalising country data from the WarEra API."""
 
+from bisect import bisect_left
+
+from services.api_client import APIClient
+
 # Static list of all 173 countries in WarEra (used for autocomplete).
 ALL_COUNTRY_NAMES: list[str] = [
     "Afghanistan", "Albania", "Algeria", "Angola", "Argentina", "Armenia",
@@ -34,22 +38,64 @@ ALL_COUNTRY_NAMES: list[str] = [
     "Vietnam", "Yemen", "Zambia", "Zimbabwe",
 ]
 
+# (lowercase name, display name) sorted by lowercase name, for prefix bisects.
+_ALL_LOWER: tuple[tuple[str, str], ...] = tuple(sorted((n.lower(), n) for n in ALL_COUNTRY_NAMES))
+_ALL_KEYS: tuple[str, ...] = tuple(k for k, _ in _ALL_LOWER)
+
+
+def autocomplete_prefix(query: str, limit: int = 25) -> list[str]:
+    """Return up to *limit* country names starting with *query* (case-insensitive)."""
+    q = query.strip().lower()
+    out: list[str] = []
+    i = bisect_left(_ALL_KEYS, q)
+    while i < len(_ALL_KEYS) and len(out) < limit and _ALL_KEYS[i].startswith(q):
+        out.append(_ALL_LOWER[i][1])
+        i += 1
+    return out
+
 
 def extract_country_list(api_response) -> list[dict]:
     """Normalise the getAllCountries API envelope into a plain list of country dicts."""
-    if isinstance(api_response, list):
-        return [c for c in api_response if isinstance(c, dict)]
-    if isinstance(api_response, dict):
-        if isinstance(api_response.get("data"), list):
-            return [c for c in api_response["data"] if isinstance(c, dict)]
-        r = api_response.get("result")
-        if isinstance(r, dict) and isinstance(r.get("data"), list):
-            return [c for c in r["data"] if isinstance(c, dict)]
-        for key in ("countries", "items"):
-            v = api_response.get(key)
-            if isinstance(v, list):
-                return [c for c in v if isinstance(c, dict)]
-    return []
+    return APIClient.normalize_list(api_response, ("data", "countries", "items"))
+
+
+class CountryIndex(list):
+    """A country list with prebuilt case-insensitive lookup maps.
+
+    Behaves like the plain ``list[dict]`` returned by
+    :func:`extract_country_list`, so it can be iterated and indexed as
+    before; :func:`find_country` uses the maps instead of scanning.
+    Build it once per fetched country list and reuse it across lookups.
+    """
+
+    def __init__(self, countries) -> None:
+        super().__init__(countries)
+        self._by_code: dict[str, dict] = {}
+        self._by_name: dict[str, dict] = {}
+        # lowercase name → list position of its first occurrence
+        self._name_pos: dict[str, int] = {}
+        for i, c in enumerate(self):
+            # setdefault keeps the first occurrence, like the old linear scans
+            self._by_code.setdefault(str(c.get("code", "")).lower(), c)
+            name = str(c.get("name", "")).lower()
+            self._by_name.setdefault(name, c)
+            self._name_pos.setdefault(name, i)
+        self._sorted_names: list[str] = sorted(self._by_name)
+
+    def find(self, query: str) -> dict | None:
+        q = query.strip().lower()
+        hit = self._by_code.get(q) or self._by_name.get(q)
+        if hit:
+            return hit
+        # names sharing the prefix are contiguous in sorted order; of those,
+        # return the one listed first, like the old linear scan
+        best: str | None = None
+        for name in self._sorted_names[bisect_left(self._sorted_names, q):]:
+            if not name.startswith(q):
+                break
+            if best is None or self._name_pos[name] < self._name_pos[best]:
+                best = name
+        return self._by_name[best] if best is not None else None
 
 
 def find_country(query: str, country_list: list[dict]) -> dict | None:
@@ -59,15 +105,12 @@ def find_country(query: str, country_list: list[dict]) -> dict | None:
       1. Exact code match  (e.g. "NL", "CH")
       2. Exact name match  (e.g. "Netherlands", "Switzerland")
       3. Name starts-with  (e.g. "switz" → Switzerland)
+
+    Pass a :class:`CountryIndex` to avoid rebuilding the lookup maps per call.
     """
-    q = query.strip().lower()
-    hit = next((c for c in country_list if str(c.get("code", "")).lower() == q), None)
-    if hit:
-        return hit
-    hit = next((c for c in country_list if str(c.get("name", "")).lower() == q), None)
-    if hit:
-        return hit
-    return next((c for c in country_list if str(c.get("name", "")).lower().startswith(q)), None)
+    if not isinstance(country_list, CountryIndex):
+        country_list = CountryIndex(country_list)
+    return country_list.find(query)
 
 
 def country_id(country: dict) -> str:
@@ -1,9 +1,95 @@
 import aiosqlite
+import asyncio
+import contextlib
 import logging
-from typing import Optional
+import os
+import re
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, NamedTuple, Optional
+import zlib
+from urllib.parse import quote
+
+try:
+    import zstandard as _zstd
+except ImportError:  # pragma: no cover - depends on the environment
+    _zstd = None
 
 logger = logging.getLogger("services.db")
 
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_zstd_c = _zstd.ZstdCompressor(level=3) if _zstd is not None else None
+_zstd_d = _zstd.ZstdDecompressor() if _zstd is not None else None
+
+
+def _pack_raw(raw_json: str) -> bytes:
+    """Compress a JSON payload for storage: zstd when installed, else zlib."""
+    data = raw_json.encode()
+    if _zstd_c is not None:
+        return _zstd_c.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _unpack_raw(blob: bytes) -> bytes:
+    """Inverse of :func:`_pack_raw`; the codec is detected from the header.
+
+    Uncompressed payloads (written before compression was added) start with
+    ``{`` or ``[`` and are returned as-is.
+    """
+    if blob.startswith(_ZSTD_MAGIC):
+        if _zstd_d is None:
+            raise RuntimeError("snapshot is zstd-compressed but zstandard is not installed")
+        return _zstd_d.decompress(blob)
+    if blob[:1] == b"\x78":
+        return zlib.decompress(blob)
+    return blob
+
+
+def _to_epoch(updated_at: str | int) -> int:
+    """Unix seconds for an ISO-8601 timestamp (``Z`` suffix allowed); ints pass through."""
+    if isinstance(updated_at, int):
+        return updated_at
+    dt = datetime.fromisoformat(updated_at.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _from_epoch(ts: int | None) -> str | None:
+    """Inverse of :func:`_to_epoch`: ``YYYY-MM-DDTHH:MM:SSZ`` in UTC."""
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class TopRow(NamedTuple):
+    """A ``specialization_top`` row; ``_asdict()`` gives the old dict form."""
+
+    item: str
+    country_id: str
+    country_name: str
+    production_bonus: float
+    strategic_bonus: float | None
+    ethic_bonus: float | None
+    ethic_deposit_bonus: float | None
+    updated_at: str | None
+
+
+class _NotConnected:
+    """Stand-in for the connection before setup() / after close().
+
+    It is falsy, and any attribute access raises, so methods can use
+    ``self._conn`` directly instead of each checking for ``None`` first.
+    """
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __getattr__(self, name: str):
+        raise RuntimeError("Database not initialized; call setup() first")
+
+
+_NOT_CONNECTED = _NotConnected()
+
 
 class Database:
     """Simple async wrapper around a SQLite file for storing poll state and job metadata.
@@ -12,18 +98,113 @@ class Database:
     if you need more scale.
     """
 
-    def __init__(self, path: str = "database/external.db") -> None:
+    def __init__(
+        self, path: str = "database/external.db", readers: int | None = None,
+        wal_autocheckpoint: int = 1000,
+    ) -> None:
         self.path = path
-        self._conn: Optional[aiosqlite.Connection] = None
+        # 0 disables automatic WAL checkpoints; the owner must then call
+        # checkpoint() periodically or the -wal file grows without bound.
+        self._wal_autocheckpoint = wal_autocheckpoint
+        # _conn is the single writer; simple lookups may borrow a read-only
+        # connection from _readers so they don't queue behind writes.
+        self._conn: aiosqlite.Connection = _NOT_CONNECTED  # type: ignore[assignment]
+        self._reader_count = readers if readers is not None else min(4, os.cpu_count() or 1)
+        self._readers: Optional[asyncio.Queue[aiosqlite.Connection]] = None
+        # item → last written TopRow; lets unchanged tops skip the write
+        # entirely and serves get_top_specialization without a query.
+        self._top_cache: dict[str, TopRow] = {}
+        # poll_state key → value, written through by set_poll_state.
+        self._poll_state_cache: dict[str, Optional[str]] = {}
+        # Pending deferred commit for small, frequent writes; see _defer_commit().
+        self._commit_task: Optional[asyncio.Task] = None
+        # Serializes use of the single writer connection: held for the whole
+        # of a _write_tx block so concurrent writers never share a transaction.
+        self._write_lock = asyncio.Lock()
+
+    # In-place upserts: INSERT OR REPLACE would delete the old row and insert a
+    # new one, rewriting the primary-key index on every poll.
+    _UPSERT_COUNTRY_SNAPSHOT = (
+        "INSERT INTO country_snapshots(country_id, code, name, specialized_item, production_bonus, updated_at) VALUES(?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(country_id) DO UPDATE SET code = excluded.code, name = excluded.name, "
+        "specialized_item = excluded.specialized_item, production_bonus = excluded.production_bonus, "
+        "updated_at = excluded.updated_at"
+    )
+    _UPSERT_COUNTRY_SNAPSHOT_RAW = (
+        "INSERT INTO country_snapshots_raw(country_id, raw) VALUES(?, ?) "
+        "ON CONFLICT(country_id) DO UPDATE SET raw = excluded.raw"
+    )
+    _UPSERT_SPECIALIZATION_TOP = (
+        "INSERT INTO specialization_top(item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(item) DO UPDATE SET country_id = excluded.country_id, country_name = excluded.country_name, "
+        "production_bonus = excluded.production_bonus, strategic_bonus = excluded.strategic_bonus, "
+        "ethic_bonus = excluded.ethic_bonus, ethic_deposit_bonus = excluded.ethic_deposit_bonus, updated_at = excluded.updated_at"
+    )
+    _UPSERT_DEPOSIT_TOP = (
+        "INSERT INTO deposit_top(item, region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(item) DO UPDATE SET region_id = excluded.region_id, region_name = excluded.region_name, "
+        "country_id = excluded.country_id, country_name = excluded.country_name, bonus = excluded.bonus, "
+        "deposit_bonus = excluded.deposit_bonus, ethic_deposit_bonus = excluded.ethic_deposit_bonus, "
+        "permanent_bonus = excluded.permanent_bonus, deposit_end_at = excluded.deposit_end_at, updated_at = excluded.updated_at"
+    )
+    _UPSERT_CITIZEN_LEVEL = (
+        "INSERT INTO citizen_levels(user_id, country_id, level, skill_mode, last_skills_reset_at, citizen_name, last_login_at, mu_id, mu_name, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET country_id = excluded.country_id, level = excluded.level, "
+        "skill_mode = excluded.skill_mode, last_skills_reset_at = excluded.last_skills_reset_at, "
+        "citizen_name = excluded.citizen_name, last_login_at = excluded.last_login_at, "
+        "mu_id = excluded.mu_id, mu_name = excluded.mu_name, updated_at = excluded.updated_at"
+    )
+    _UPSERT_WAR_EVENT = (
+        "INSERT INTO war_events(event_id, event_type, battle_id, war_id, attacker_country_id, defender_country_id, "
+        "region_id, region_name, attacker_name, defender_name, created_at, raw_json) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(event_id) DO UPDATE SET event_type = excluded.event_type, battle_id = excluded.battle_id, "
+        "war_id = excluded.war_id, attacker_country_id = excluded.attacker_country_id, "
+        "defender_country_id = excluded.defender_country_id, region_id = excluded.region_id, "
+        "region_name = excluded.region_name, attacker_name = excluded.attacker_name, "
+        "defender_name = excluded.defender_name, created_at = excluded.created_at, raw_json = excluded.raw_json"
+    )
+    _UPSERT_LUCK_SCORE = (
+        "INSERT INTO citizen_luck(user_id, country_id, citizen_name, luck_score, opens_count, updated_at) VALUES(?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET country_id = excluded.country_id, citizen_name = excluded.citizen_name, "
+        "luck_score = excluded.luck_score, opens_count = excluded.opens_count, updated_at = excluded.updated_at"
+    )
+
+    # sqlite3 keeps compiled statements per connection keyed by SQL text, so
+    # the fixed queries below are parsed once. The default cache (128) is
+    # enlarged so the variable-length multi-row upserts don't evict them.
+    _STATEMENT_CACHE_SIZE = 512
+    # Upper bound for memory-mapped I/O per connection (256 MiB).
+    _MMAP_SIZE = 256 * 1024 * 1024
 
     async def setup(self) -> None:
-        self._conn = await aiosqlite.connect(self.path)
+        self._conn = await aiosqlite.connect(self.path, cached_statements=self._STATEMENT_CACHE_SIZE)
+        # Several cogs open their own Database on the same file: WAL lets their
+        # reads proceed alongside a writer, and busy_timeout makes contending
+        # writers wait instead of failing with "database is locked".
+        if self.path != ":memory:":
+            # page_size only takes effect on a brand-new file, so it has to come
+            # before WAL mode writes the header.
+            await self._conn.execute("PRAGMA page_size=8192")
+            # likewise auto_vacuum; existing files are converted by migration 4
+            await self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await self._conn.execute("PRAGMA journal_mode=WAL")
+            # Reads of the (mostly scanned) citizen/snapshot tables come straight
+            # from the page cache mapping instead of a read() copy per page.
+            await self._conn.execute(f"PRAGMA mmap_size={self._MMAP_SIZE}")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")
+        await self._conn.execute("PRAGMA busy_timeout=5000")
+        await self._conn.execute("PRAGMA cache_size=-20000")
+        await self._conn.execute("PRAGMA temp_store=MEMORY")
+        await self._conn.execute(f"PRAGMA wal_autocheckpoint={int(self._wal_autocheckpoint)}")
+        # sqlite3 runs DDL in autocommit mode; an explicit transaction makes the
+        # whole schema (tables, indexes, added columns) a single commit.
+        await self._conn.execute("BEGIN IMMEDIATE")
         await self._conn.execute(
             """
             CREATE TABLE IF NOT EXISTS poll_state (
                 key TEXT PRIMARY KEY,
                 value TEXT
-            )
+            ) WITHOUT ROWID
             """
         )
         await self._conn.execute(
@@ -36,7 +217,8 @@ class Database:
             )
             """
         )
-        # store latest snapshot per country
+        # store latest snapshot per country (databases from before user_version 2
+        # keep a legacy raw_json column, emptied by the migration below)
         await self._conn.execute(
             """
             CREATE TABLE IF NOT EXISTS country_snapshots (
@@ -45,8 +227,16 @@ class Database:
                 name TEXT,
                 specialized_item TEXT,
                 production_bonus REAL,
-                raw_json TEXT,
-                updated_at TEXT
+                updated_at INTEGER
+            ) WITHOUT ROWID
+            """
+        )
+        # full country payload per snapshot, kept apart so metadata scans stay small
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS country_snapshots_raw (
+                country_id TEXT PRIMARY KEY,
+                raw BLOB
             )
             """
         )
@@ -62,17 +252,14 @@ class Database:
                 strategic_bonus REAL,
                 ethic_bonus REAL,
                 ethic_deposit_bonus REAL,
-                updated_at TEXT
-            )
+                updated_at INTEGER
+            ) WITHOUT ROWID
             """
         )
         # migrations: add breakdown columns if missing
-        for col in ("strategic_bonus REAL", "ethic_bonus REAL", "ethic_deposit_bonus REAL"):
-            try:
-                await self._conn.execute(f"ALTER TABLE specialization_top ADD COLUMN {col}")
-                await self._conn.commit()
-            except Exception:
-                pass  # column already exists
+        await self._add_missing_columns(
+            "specialization_top", ("strategic_bonus REAL", "ethic_bonus REAL", "ethic_deposit_bonus REAL")
+        )
 
         # store current deposit top per specialization item
         await self._conn.execute(
@@ -93,12 +280,10 @@ class Database:
             """
         )
         # migrations: add breakdown columns if missing
-        for col in ("region_name TEXT", "deposit_bonus REAL", "ethic_deposit_bonus REAL"):
-            try:
-                await self._conn.execute(f"ALTER TABLE deposit_top ADD COLUMN {col}")
-                await self._conn.commit()
-            except Exception:
-                pass  # column already exists        # citizen level cache (populated by the daily background task)
+        await self._add_missing_columns(
+            "deposit_top", ("region_name TEXT", "deposit_bonus REAL", "ethic_deposit_bonus REAL")
+        )
+        # citizen level cache (populated by the daily background task)
         await self._conn.execute(
             """
             CREATE TABLE IF NOT EXISTS citizen_levels (
@@ -109,45 +294,27 @@ class Database:
             )
             """
         )
+        # serves both GROUP BY level and the level-ordered cooldown list (ORDER BY level DESC, user_id)
         await self._conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_citizen_levels_country ON citizen_levels(country_id)"
+            "CREATE INDEX IF NOT EXISTS idx_citizen_levels_country_level_desc "
+            "ON citizen_levels(country_id, level DESC, user_id)"
+        )
+        # superseded by idx_citizen_levels_country_level_desc (same leading columns)
+        await self._conn.execute("DROP INDEX IF EXISTS idx_citizen_levels_country")
+        await self._conn.execute("DROP INDEX IF EXISTS idx_citizen_levels_country_level")
+        # migrations: columns added after the table was first released
+        await self._add_missing_columns(
+            "citizen_levels",
+            (
+                "skill_mode TEXT", "last_skills_reset_at TEXT", "citizen_name TEXT",
+                "last_login_at TEXT", "mu_id TEXT", "mu_name TEXT",
+            ),
+        )
+        # lets the per-MU listings walk the index instead of sorting every call
+        await self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_citizen_levels_country_mu_level "
+            "ON citizen_levels(country_id, mu_name, level DESC)"
         )
-        # migration: add skill_mode column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN skill_mode TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
-        # migration: add last_skills_reset_at column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN last_skills_reset_at TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
-        # migration: add citizen_name column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN citizen_name TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
-        # migration: add last_login_at column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN last_login_at TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
-        # migration: add mu_id column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN mu_id TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
-        # migration: add mu_name column if missing
-        try:
-            await self._conn.execute("ALTER TABLE citizen_levels ADD COLUMN mu_name TEXT")
-            await self._conn.commit()
-        except Exception:
-            pass  # column already exists
         # track which articles have already been posted to Discord
         await self._conn.execute(
             """
@@ -202,90 +369,409 @@ class Database:
             "CREATE INDEX IF NOT EXISTS idx_citizen_luck_country ON citizen_luck(country_id)"
         )
         await self._conn.commit()
+        # migration (user_version 1): small key → value tables become WITHOUT ROWID
+        async with self._conn.execute("PRAGMA user_version") as cur:
+            (version,) = await cur.fetchone()
+        if version < 1:
+            for table in ("poll_state", "specialization_top"):
+                await self._rebuild_without_rowid(table)
+            await self._conn.execute("PRAGMA user_version = 1")
+            await self._conn.commit()
+        # migration (user_version 2): snapshot payloads move to country_snapshots_raw
+        if version < 2:
+            async with self._conn.execute("PRAGMA table_info(country_snapshots)") as cur:
+                has_raw = any(col[1] == "raw_json" for col in await cur.fetchall())
+            if has_raw:
+                await self._conn.execute("BEGIN IMMEDIATE")
+                await self._conn.execute(
+                    "INSERT INTO country_snapshots_raw(country_id, raw) "
+                    "SELECT country_id, CAST(raw_json AS BLOB) FROM country_snapshots WHERE raw_json IS NOT NULL "
+                    "ON CONFLICT(country_id) DO NOTHING"
+                )
+                await self._conn.execute("UPDATE country_snapshots SET raw_json = NULL")
+                await self._conn.commit()
+            await self._rebuild_without_rowid("country_snapshots")
+            await self._conn.execute("PRAGMA user_version = 2")
+            await self._conn.commit()
+        # migration (user_version 3): snapshot/top updated_at becomes INTEGER unix seconds
+        if version < 3:
+            for table in ("country_snapshots", "specialization_top"):
+                await self._rebuild_table(
+                    table,
+                    lambda body: re.sub(r"\bupdated_at TEXT\b", "updated_at INTEGER", body),
+                    {"updated_at": "CAST(strftime('%s', updated_at) AS INTEGER)"},
+                )
+            await self._conn.execute("PRAGMA user_version = 3")
+            await self._conn.commit()
+        # migration (user_version 4): incremental auto-vacuum, which an existing
+        # file only picks up through a full VACUUM.  That rewrites the whole file,
+        # so it is left to enable_incremental_vacuum() rather than run at startup.
+        if version < 4:
+            async with self._conn.execute("PRAGMA auto_vacuum") as cur:
+                (mode,) = await cur.fetchone()
+            if mode != 2 and self.path != ":memory:":  # 2 = INCREMENTAL
+                logger.warning(
+                    "%s still needs a full VACUUM for incremental auto-vacuum; "
+                    "run the owner `vacuumdb` command in a quiet moment",
+                    self.path,
+                )
+            await self._conn.execute("PRAGMA user_version = 4")
+            await self._conn.commit()
+        # Read-only connections need WAL to run alongside the writer, and an
+        # in-memory database can't be shared between connections at all.
+        if self.path != ":memory:" and self._reader_count > 0:
+            self._readers = asyncio.Queue()
+            uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+            for _ in range(self._reader_count):
+                reader = await aiosqlite.connect(uri, uri=True, cached_statements=self._STATEMENT_CACHE_SIZE)
+                await reader.execute("PRAGMA query_only=1")
+                await reader.execute("PRAGMA busy_timeout=5000")
+                await reader.execute(f"PRAGMA mmap_size={self._MMAP_SIZE}")
+                self._readers.put_nowait(reader)
+        self._top_cache = {t.item: t for t in await self.get_all_tops()}
         logger.info("Database initialized at %s", self.path)
 
+    async def _add_missing_columns(self, table: str, columns: tuple[str, ...]) -> None:
+        """ALTER TABLE … ADD COLUMN for each ``"name TYPE"`` in *columns* that *table* lacks."""
+        async with self._conn.execute(f"PRAGMA table_info({table})") as cur:
+            existing = {col[1] for col in await cur.fetchall()}
+        for col in columns:
+            if col.split(None, 1)[0] not in existing:
+                await self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {col}")
+                logger.info("Added column %s.%s", table, col.split(None, 1)[0])
+
+    async def _rebuild_table(
+        self, table: str, rewrite: Callable[[str], str], exprs: dict[str, str] | None = None,
+    ) -> None:
+        """Recreate *table* from its stored DDL passed through *rewrite* and copy its rows.
+
+        Starting from the stored DDL keeps columns added by earlier ALTER
+        migrations in place; nothing happens if *rewrite* leaves the DDL
+        unchanged. *exprs* maps a column name to the SQL expression
+        used to fill it during the copy (default: the column itself).
+        """
+        async with self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ) as cur:
+            row = await cur.fetchone()
+        if not row:
+            return
+        # stored DDL reads 'CREATE TABLE name (…)', or '"name"' after a RENAME
+        m = re.match(rf'CREATE TABLE\s+("?){table}\1\s*', row[0])
+        if not m:
+            logger.warning("Skipping rebuild of %s: unexpected DDL", table)
+            return
+        body = rewrite(row[0][m.end():])
+        if body == row[0][m.end():]:
+            return  # nothing to change (e.g. a fresh table already in the new shape)
+        async with self._conn.execute(f"PRAGMA table_info({table})") as cur:
+            columns = [col[1] for col in await cur.fetchall()]
+        select = ", ".join((exprs or {}).get(col, col) for col in columns)
+        await self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            await self._conn.execute(f"CREATE TABLE {table}_new " + body)
+            await self._conn.execute(
+                f"INSERT INTO {table}_new({', '.join(columns)}) SELECT {select} FROM {table}"
+            )
+            await self._conn.execute(f"DROP TABLE {table}")
+            await self._conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        except BaseException:
+            await self._conn.rollback()
+            raise
+        await self._conn.commit()
+        logger.info("Rebuilt table %s", table)
+
+    async def _rebuild_without_rowid(self, table: str) -> None:
+        """Convert *table* to WITHOUT ROWID; no-op if it already is."""
+        async with self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ) as cur:
+            row = await cur.fetchone()
+        if row and "WITHOUT ROWID" not in row[0].upper():
+            await self._rebuild_table(table, lambda body: body + " WITHOUT ROWID")
+
     async def close(self) -> None:
+        if self._readers is not None:
+            while not self._readers.empty():
+                await self._readers.get_nowait().close()
+            self._readers = None
         if self._conn:
-            await self._conn.close()
-            self._conn = None
+            await self.flush()
+            async with self._write_lock:
+                try:
+                    # refresh planner statistics for tables that changed enough to need it
+                    await self._conn.execute("PRAGMA optimize")
+                except Exception:
+                    logger.exception("PRAGMA optimize failed on close")
+                await self._conn.close()
+                self._conn = _NOT_CONNECTED  # type: ignore[assignment]
+
+    # How long small writes may sit in an open transaction before being committed.
+    _COMMIT_DELAY = 0.1
+
+    def _defer_commit(self) -> None:
+        """Commit shortly instead of now, so bursts of small writes share one commit."""
+        if self._commit_task is None or self._commit_task.done():
+            self._commit_task = asyncio.create_task(self._delayed_commit())
+
+    async def _delayed_commit(self) -> None:
+        await asyncio.sleep(self._COMMIT_DELAY)
+        # _write_tx commits before releasing the lock, so whatever is still
+        # open once we hold it is deferred-only work
+        async with self._write_lock:
+            try:
+                if self._conn.in_transaction:
+                    await self._conn.commit()
+            except Exception:
+                logger.exception("Deferred commit failed")
+
+    async def flush(self) -> None:
+        """Commit any pending writes now (deferred or left open by batch upserts)."""
+        if self._commit_task is not None and not self._commit_task.done():
+            self._commit_task.cancel()
+        self._commit_task = None
+        if self._conn:
+            async with self._write_lock:
+                if self._conn.in_transaction:
+                    await self._conn.commit()
+
+    async def checkpoint(self) -> tuple[int, int, int]:
+        """Copy committed WAL frames back into the database file without blocking.
+
+        Runs ``PRAGMA wal_checkpoint(PASSIVE)`` and returns its
+        ``(busy, wal_frames, checkpointed_frames)`` row.
+        """
+        await self.flush()
+        # on the shared writer, so it must not interleave with an open _write_tx
+        async with self._write_lock, self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)") as cur:
+            row = await cur.fetchone()
+        return tuple(row) if row else (0, 0, 0)
+
+    async def enable_incremental_vacuum(self) -> bool:
+        """Switch an existing file to ``auto_vacuum=INCREMENTAL`` with a full VACUUM.
+
+        The VACUUM rewrites the whole database and blocks every writer until it
+        finishes.  Returns False when the file is already in incremental mode.
+        """
+        await self.flush()
+        async with self._write_lock:
+            async with self._conn.execute("PRAGMA auto_vacuum") as cur:
+                (mode,) = await cur.fetchone()
+            if mode == 2:  # INCREMENTAL
+                return False
+            await self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await self._conn.execute("VACUUM")
+        logger.info("Enabled incremental auto-vacuum on %s", self.path)
+        return True
+
+    async def incremental_vacuum(self, pages: int = 1000) -> None:
+        """Return up to *pages* free pages to the filesystem (needs auto_vacuum=INCREMENTAL)."""
+        async with self._write_lock, self._conn.execute(f"PRAGMA incremental_vacuum({int(pages)})") as cur:
+            await cur.fetchall()  # the pragma frees one page per step
+
+    @contextlib.asynccontextmanager
+    async def _read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read-only connection, or the writer when no pool is open."""
+        if self._readers is None:
+            yield self._conn
+            return
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+
+    # SQLite's default limit on bound parameters per statement.
+    _MAX_VARIABLES = 999
+
+    @classmethod
+    async def _execute_values(cls, conn: aiosqlite.Connection, sql: str, rows: list[tuple]) -> None:
+        """Run a single-row ``INSERT … VALUES(?, …) …`` statement for many rows.
+
+        The VALUES group is repeated so each statement carries as many rows as
+        fit under :attr:`_MAX_VARIABLES`, rather than stepping once per row.
+        """
+        group = "(" + ", ".join(["?"] * len(rows[0])) + ")"
+        head, sep, tail = sql.partition("VALUES" + group)
+        if not sep:
+            raise ValueError("statement has no single-row VALUES group matching the row width")
+        step = cls._MAX_VARIABLES // len(rows[0])
+        for start in range(0, len(rows), step):
+            chunk = rows[start : start + step]
+            await conn.execute(
+                f"{head}VALUES {', '.join([group] * len(chunk))}{tail}",
+                [v for row in chunk for v in row],
+            )
+
+    @contextlib.asynccontextmanager
+    async def _write_tx(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Run a write transaction on the writer: BEGIN IMMEDIATE, then commit or roll back.
+
+        The block holds :attr:`_write_lock` throughout, so no other coroutine
+        can write, commit or roll back on the writer in between its
+        statements. Taking SQLite's write lock up front avoids SQLITE_BUSY on
+        a deferred transaction's lock upgrade. Work already left open by
+        unflushed small writes is committed first, so the block always owns
+        its transaction and a rollback only undoes its own statements.
+        """
+        async with self._write_lock:
+            if self._conn.in_transaction:
+                await self._conn.commit()
+            await self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                await self._conn.rollback()
+                raise
+            await self._conn.commit()
+
+    @contextlib.asynccontextmanager
+    async def _deferred_write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Run small writes on the writer under :attr:`_write_lock` and commit them shortly.
 
-    async def get_poll_state(self, key: str) -> Optional[str]:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        async with self._conn.execute("SELECT value FROM poll_state WHERE key = ?", (key,)) as cur:
+        For frequent single-statement writes whose durability can wait
+        :attr:`_COMMIT_DELAY`; see :meth:`_defer_commit`.
+        """
+        async with self._write_lock:
+            yield self._conn
+        self._defer_commit()
+
+    async def get_poll_state(self, key: str, use_cache: bool = True) -> Optional[str]:
+        """Return the stored value for *key*.
+
+        Values read or written through this instance are cached; pass
+        ``use_cache=False`` when another connection may have changed the key.
+        """
+        if use_cache and key in self._poll_state_cache:
+            return self._poll_state_cache[key]
+        async with self._read() as conn, conn.execute("SELECT value FROM poll_state WHERE key = ?", (key,)) as cur:
             row = await cur.fetchone()
-            return row[0] if row else None
+        value = row[0] if row else None
+        self._poll_state_cache[key] = value
+        return value
 
     async def set_poll_state(self, key: str, value: str) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "INSERT INTO poll_state(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
-            (key, value),
-        )
-        await self._conn.commit()
+        async with self._write_tx() as conn:
+            await conn.execute(
+                "INSERT INTO poll_state(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value),
+            )
+        self._poll_state_cache[key] = value
 
     async def create_job(self, job_id: str) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute("INSERT OR REPLACE INTO jobs(id, status, progress) VALUES(?, ?, ?)", (job_id, "pending", 0))
-        await self._conn.commit()
+        async with self._write_tx() as conn:
+            await conn.execute(
+                "INSERT INTO jobs(id, status, progress) VALUES(?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, progress = excluded.progress, result_path = NULL",
+                (job_id, "pending", 0),
+            )
 
     async def update_job_progress(self, job_id: str, progress: int, status: Optional[str] = None) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        if status:
-            await self._conn.execute("UPDATE jobs SET progress = ?, status = ? WHERE id = ?", (progress, status, job_id))
-        else:
-            await self._conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
-        await self._conn.commit()
+        async with self._deferred_write() as conn:
+            if status:
+                await conn.execute("UPDATE jobs SET progress = ?, status = ? WHERE id = ?", (progress, status, job_id))
+            else:
+                await conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+
+    async def save_country_snapshot(self, country_id: str, code: str | None, name: str | None, specialized_item: str | None, production_bonus: float | None, raw_json: str, updated_at: str | int) -> None:
+        async with self._write_tx() as conn:
+            await conn.execute(
+                self._UPSERT_COUNTRY_SNAPSHOT,
+                (country_id, code, name, specialized_item, production_bonus, _to_epoch(updated_at)),
+            )
+            await conn.execute(self._UPSERT_COUNTRY_SNAPSHOT_RAW, (country_id, _pack_raw(raw_json)))
 
-    async def save_country_snapshot(self, country_id: str, code: str | None, name: str | None, specialized_item: str | None, production_bonus: float | None, raw_json: str, updated_at: str) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "INSERT OR REPLACE INTO country_snapshots(country_id, code, name, specialized_item, production_bonus, raw_json, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?)",
-            (country_id, code, name, specialized_item, production_bonus, raw_json, updated_at),
-        )
-        await self._conn.commit()
+    async def save_country_snapshots(self, rows: Iterable[tuple]) -> None:
+        """Save many country snapshots in one transaction.
+
+        Each row is ``(country_id, code, name, specialized_item,
+        production_bonus, raw_json, updated_at)``, as for
+        :meth:`save_country_snapshot`.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        async with self._write_tx() as conn:
+            await self._execute_values(
+                conn, self._UPSERT_COUNTRY_SNAPSHOT,
+                [(r[0], r[1], r[2], r[3], r[4], _to_epoch(r[6])) for r in rows],
+            )
+            await self._execute_values(
+                conn, self._UPSERT_COUNTRY_SNAPSHOT_RAW,
+                [(r[0], _pack_raw(r[5])) for r in rows],
+            )
 
-    async def get_top_specialization(self, item: str) -> Optional[dict]:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        async with self._conn.execute("SELECT country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at FROM specialization_top WHERE item = ?", (item,)) as cur:
+    async def get_raw_snapshot(self, country_id: str) -> bytes | None:
+        """Return the stored JSON payload (decompressed UTF-8 bytes) for a country snapshot."""
+        async with self._read() as conn, conn.execute(
+            "SELECT raw FROM country_snapshots_raw WHERE country_id = ?", (country_id,)
+        ) as cur:
             row = await cur.fetchone()
-            if not row:
-                return None
-            return {"country_id": row[0], "country_name": row[1], "production_bonus": row[2], "strategic_bonus": row[3], "ethic_bonus": row[4], "ethic_deposit_bonus": row[5], "updated_at": row[6]}
-
-    async def get_all_tops(self) -> list:
-        """Return all specialization tops as a list of dicts."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        rows = []
-        async with self._conn.execute("SELECT item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at FROM specialization_top") as cur:
-            async for row in cur:
-                rows.append({"item": row[0], "country_id": row[1], "country_name": row[2], "production_bonus": row[3], "strategic_bonus": row[4], "ethic_bonus": row[5], "ethic_deposit_bonus": row[6], "updated_at": row[7]})
-        return rows
+        return _unpack_raw(bytes(row[0])) if row and row[0] is not None else None
 
-    async def delete_top_specialization(self, item: str) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute("DELETE FROM specialization_top WHERE item = ?", (item,))
-        await self._conn.commit()
+    async def get_top_specialization(self, item: str, use_cache: bool = True) -> Optional[TopRow]:
+        """Return the stored top for *item*, from the write-through cache when possible."""
+        if use_cache and item in self._top_cache:
+            return self._top_cache[item]
+        async with self._read() as conn, conn.execute("SELECT item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at FROM specialization_top WHERE item = ?", (item,)) as cur:
+            row = await cur.fetchone()
+        return TopRow(*row[:7], _from_epoch(row[7])) if row else None
 
-    async def set_top_specialization(self, item: str, country_id: str, country_name: str, production_bonus: float, updated_at: str, strategic_bonus: float | None = None, ethic_bonus: float | None = None, ethic_deposit_bonus: float | None = None) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "INSERT OR REPLACE INTO specialization_top(item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
-            (item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at),
+    async def get_all_tops(self) -> list[TopRow]:
+        """Return all specialization tops."""
+        async with self._read() as conn, conn.execute("SELECT item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at FROM specialization_top") as cur:
+            rows = await cur.fetchall()
+        return [TopRow(*r[:7], _from_epoch(r[7])) for r in rows]
+
+    async def delete_top_specialization(self, item: str) -> None:
+        async with self._write_tx() as conn:
+            await conn.execute("DELETE FROM specialization_top WHERE item = ?", (item,))
+        self._top_cache.pop(item, None)
+
+    async def zero_production_tops(self) -> int:
+        """Set every stored top bonus to 0 (testing aid); returns the number of specialization tops."""
+        async with self._write_tx() as conn:
+            await conn.execute("UPDATE specialization_top SET production_bonus = 0")
+            await conn.execute("UPDATE deposit_top SET bonus = 0")
+            async with conn.execute("SELECT COUNT(*) FROM specialization_top") as cur:
+                (count,) = await cur.fetchone()
+        self._top_cache.clear()
+        return count
+
+    async def clear_production_tops(self) -> None:
+        """Delete all specialization and deposit tops."""
+        async with self._write_tx() as conn:
+            await conn.execute("DELETE FROM specialization_top")
+            await conn.execute("DELETE FROM deposit_top")
+        self._top_cache.clear()
+
+    async def set_top_specialization(self, item: str, country_id: str, country_name: str, production_bonus: float, updated_at: str | int, strategic_bonus: float | None = None, ethic_bonus: float | None = None, ethic_deposit_bonus: float | None = None) -> None:
+        await self.set_top_specializations(
+            [(item, country_id, country_name, production_bonus, strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at)]
         )
-        await self._conn.commit()
 
+    async def set_top_specializations(self, rows: Iterable[tuple]) -> None:
+        """Set many specialization tops in one transaction.
+
+        Each row is ``(item, country_id, country_name, production_bonus,
+        strategic_bonus, ethic_bonus, ethic_deposit_bonus, updated_at)``.
+        Rows identical to the last value written for their item are skipped,
+        so ``updated_at`` records when a top last changed.
+        """
+        rows = [r for r in rows if self._top_cache.get(r[0], ())[1:7] != tuple(r[1:7])]
+        if not rows:
+            return
+        async with self._write_tx() as conn:
+            await self._execute_values(
+                conn, self._UPSERT_SPECIALIZATION_TOP,
+                [(*r[:7], _to_epoch(r[7])) for r in rows],
+            )
+        for r in rows:
+            self._top_cache[r[0]] = TopRow(*r[:7], _from_epoch(_to_epoch(r[7])))
+
+    # deposit_top is written with deferred commits, which the read-only pool
+    # cannot see until they land; read it on the writer instead.
     async def get_deposit_top(self, item: str) -> dict | None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         async with self._conn.execute(
             "SELECT region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at FROM deposit_top WHERE item = ?",
             (item,),
@@ -301,73 +787,115 @@ class Database:
             }
 
     async def get_all_deposit_tops(self) -> list[dict]:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        rows = []
         async with self._conn.execute(
             "SELECT item, region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at FROM deposit_top"
         ) as cur:
-            async for row in cur:
-                rows.append({
-                    "item": row[0], "region_id": row[1], "region_name": row[2],
-                    "country_id": row[3], "country_name": row[4], "bonus": row[5],
-                    "deposit_bonus": row[6], "ethic_deposit_bonus": row[7],
-                    "permanent_bonus": row[8], "deposit_end_at": row[9], "updated_at": row[10],
-                })
-        return rows
+            rows = await cur.fetchall()
+        return [
+            {
+                "item": r[0], "region_id": r[1], "region_name": r[2],
+                "country_id": r[3], "country_name": r[4], "bonus": r[5],
+                "deposit_bonus": r[6], "ethic_deposit_bonus": r[7],
+                "permanent_bonus": r[8], "deposit_end_at": r[9], "updated_at": r[10],
+            }
+            for r in rows
+        ]
 
     async def set_deposit_top(
         self, item: str, region_id: str, region_name: str, country_id: str, country_name: str,
         bonus: int, deposit_bonus: float, ethic_deposit_bonus: float,
         permanent_bonus: float, deposit_end_at: str, updated_at: str,
     ) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "INSERT OR REPLACE INTO deposit_top(item, region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (item, region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at),
-        )
-        await self._conn.commit()
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                self._UPSERT_DEPOSIT_TOP,
+                (item, region_id, region_name, country_id, country_name, bonus, deposit_bonus, ethic_deposit_bonus, permanent_bonus, deposit_end_at, updated_at),
+            )
 
     async def upsert_citizen_level(self, user_id: str, country_id: str, level: int, updated_at: str, skill_mode: str | None = None, last_skills_reset_at: str | None = None, citizen_name: str | None = None, last_login_at: str | None = None, mu_id: str | None = None, mu_name: str | None = None) -> None:
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "INSERT OR REPLACE INTO citizen_levels(user_id, country_id, level, skill_mode, last_skills_reset_at, citizen_name, last_login_at, mu_id, mu_name, updated_at) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (user_id, country_id, level, skill_mode, last_skills_reset_at, citizen_name, last_login_at, mu_id, mu_name, updated_at),
-        )
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                self._UPSERT_CITIZEN_LEVEL,
+                (user_id, country_id, level, skill_mode, last_skills_reset_at, citizen_name, last_login_at, mu_id, mu_name, updated_at),
+            )
+
+    # days since the last skill reset, NULL when missing or unparseable
+    _DAYS_SINCE_RESET = "julianday('now') - julianday(last_skills_reset_at)"
+
+    async def bulk_upsert_citizen_levels(self, rows: list[tuple]) -> None:
+        """Upsert many citizen rows in one write transaction.
+
+        Each row is ``(user_id, country_id, level, skill_mode,
+        last_skills_reset_at, citizen_name, last_login_at, mu_id, mu_name,
+        updated_at)`` — the same order as :meth:`upsert_citizen_level`'s columns.
+        """
+        if not rows:
+            return
+        async with self._write_tx() as conn:
+            await self._execute_values(conn, self._UPSERT_CITIZEN_LEVEL, rows)
 
     async def update_citizen_mu(self, user_id: str, mu_id: str | None, mu_name: str | None) -> None:
         """Update only the mu_id and mu_name fields for an existing citizen row."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "UPDATE citizen_levels SET mu_id = ?, mu_name = ? WHERE user_id = ?",
-            (mu_id, mu_name, user_id),
-        )
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                "UPDATE citizen_levels SET mu_id = ?, mu_name = ? WHERE user_id = ?",
+                (mu_id, mu_name, user_id),
+            )
+
+    async def bulk_update_citizen_mus(
+        self, assignments: dict[str, tuple[str | None, str | None]], country_id: str
+    ) -> int:
+        """Set mu_id/mu_name for many existing citizen rows of *country_id* and commit.
+
+        *assignments* maps ``user_id → (mu_id, mu_name)``. Users without a
+        citizen_levels row in that country (e.g. foreign MU members) are
+        filtered out by the UPDATE itself. Returns the number of rows updated.
+        """
+        items = list(assignments.items())
+        updated = 0
+        step = 300  # 3 parameters per row (+1 for country_id), under SQLite's 999 limit
+        async with self._write_tx() as conn:
+            for start in range(0, len(items), step):
+                chunk = items[start : start + step]
+                values = ", ".join(["(?, ?, ?)"] * len(chunk))
+                cur = await conn.execute(
+                    "UPDATE citizen_levels SET mu_id = v.column2, mu_name = v.column3 "
+                    f"FROM (VALUES {values}) AS v "
+                    "WHERE citizen_levels.user_id = v.column1 AND citizen_levels.country_id = ?",
+                    [x for uid, (mu_id, mu_name) in chunk for x in (uid, mu_id, mu_name)] + [country_id],
+                )
+                updated += max(cur.rowcount, 0)
+        return updated
 
     async def clear_citizen_mus_for_country(self, country_id: str) -> None:
         """Reset mu_id and mu_name to NULL for all citizens of a country (before re-assigning)."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "UPDATE citizen_levels SET mu_id = NULL, mu_name = NULL WHERE country_id = ?",
-            (country_id,),
-        )
-        await self._conn.commit()
+        async with self._write_tx() as conn:
+            await conn.execute(
+                "UPDATE citizen_levels SET mu_id = NULL, mu_name = NULL WHERE country_id = ?",
+                (country_id,),
+            )
 
     async def flush_citizen_levels(self) -> None:
         """Commit any pending citizen level upserts."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.commit()
+        await self.flush()
 
     async def delete_citizens_for_country(self, country_id: str) -> None:
         """Remove stale citizen rows for a country before a fresh refresh."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute("DELETE FROM citizen_levels WHERE country_id = ?", (country_id,))
-        await self._conn.commit()
+        async with self._write_tx() as conn:
+            await conn.execute("DELETE FROM citizen_levels WHERE country_id = ?", (country_id,))
+
+    async def delete_stale_citizens(self, country_id: str, before: str) -> int:
+        """Delete a country's citizen rows not refreshed since *before* and commit.
+
+        Used after a full refresh has upserted every current citizen with a
+        new ``updated_at``; returns the number of rows removed.
+        """
+        async with self._write_tx() as conn:
+            cur = await conn.execute(
+                "DELETE FROM citizen_levels WHERE country_id = ? AND updated_at < ?",
+                (country_id, before),
+            )
+        return max(cur.rowcount, 0)
 
     async def get_level_distribution(
         self, country_id: str | None
@@ -377,8 +905,6 @@ class Database:
         active_counts counts only citizens whose last_login_at is within the
         last 24 hours.  If last_login_at data is unavailable the dict is empty.
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         from datetime import datetime, timedelta, timezone
         cutoff = (
             datetime.now(timezone.utc) - timedelta(hours=24)
@@ -386,45 +912,46 @@ class Database:
         counts: dict[int, int] = {}
         active: dict[int, int] = {}
         last_updated: str | None = None
+        sql = (
+            "SELECT level, COUNT(*), "
+            "SUM(CASE WHEN last_login_at >= ? THEN 1 ELSE 0 END), "
+            "MAX(updated_at) FROM citizen_levels"
+        )
+        params: tuple = (cutoff,)
         if country_id:
-            sql = "SELECT level, updated_at, last_login_at FROM citizen_levels WHERE country_id = ?"
-            params: tuple = (country_id,)
-        else:
-            sql = "SELECT level, updated_at, last_login_at FROM citizen_levels"
-            params = ()
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                lvl, updated_at, last_login_at = row
+            sql += " WHERE country_id = ?"
+            params += (country_id,)
+        sql += " GROUP BY level"
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            async for lvl, n, n_active, upd in cur:
+                # GROUP BY level yields each level once, so no accumulation needed
                 if lvl is not None:
                     lvl = int(lvl)
-                    counts[lvl] = counts.get(lvl, 0) + 1
-                    if last_login_at and last_login_at[:19] >= cutoff:
-                        active[lvl] = active.get(lvl, 0) + 1
-                if last_updated is None or updated_at > last_updated:
-                    last_updated = updated_at
+                    counts[lvl] = n
+                    if n_active:
+                        active[lvl] = n_active
+                if last_updated is None or upd > last_updated:
+                    last_updated = upd
         return counts, active, last_updated
 
     async def get_skill_mode_distribution(self, country_id: str | None) -> tuple[int, int, int, str | None]:
         """Return (eco_count, war_count, unknown_count, last_updated) for a country or all countries."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         eco = war = unknown = 0
         last_updated: str | None = None
+        sql = "SELECT skill_mode, COUNT(*), MAX(updated_at) FROM citizen_levels"
+        params: tuple = ()
         if country_id:
-            sql = "SELECT skill_mode, updated_at FROM citizen_levels WHERE country_id = ?"
-            params: tuple = (country_id,)
-        else:
-            sql = "SELECT skill_mode, updated_at FROM citizen_levels"
-            params = ()
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                mode, upd = row
+            sql += " WHERE country_id = ?"
+            params = (country_id,)
+        sql += " GROUP BY skill_mode"
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            async for mode, n, upd in cur:
                 if mode == "eco":
-                    eco += 1
+                    eco += n
                 elif mode == "war":
-                    war += 1
+                    war += n
                 else:
-                    unknown += 1
+                    unknown += n
                 if last_updated is None or (upd and upd > last_updated):
                     last_updated = upd
         return eco, war, unknown, last_updated
@@ -437,137 +964,131 @@ class Database:
         Returns a dict keyed by bucket_start (1, 6, 11, …) where each value is
         {"eco": n, "war": n, "unknown": n}, plus the most-recent updated_at string.
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
+        # a missing or zero level counts as level 1, matching the bucket labels
+        sql = (
+            "SELECT ((COALESCE(NULLIF(level, 0), 1) - 1) / 5) * 5 + 1 AS bucket, "
+            "CASE WHEN skill_mode IN ('eco', 'war') THEN skill_mode ELSE 'unknown' END AS mode, "
+            "COUNT(*), MAX(updated_at) FROM citizen_levels"
+        )
+        params: tuple = ()
         if country_id:
-            sql = "SELECT level, skill_mode, updated_at FROM citizen_levels WHERE country_id = ?"
-            params: tuple = (country_id,)
-        else:
-            sql = "SELECT level, skill_mode, updated_at FROM citizen_levels"
-            params = ()
+            sql += " WHERE country_id = ?"
+            params = (country_id,)
+        sql += " GROUP BY bucket, mode"
         buckets: dict[int, dict[str, int]] = {}
         last_updated: str | None = None
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                level, mode, upd = row
-                bucket = ((int(level or 1) - 1) // 5) * 5 + 1
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            async for bucket, mode, n, upd in cur:
                 if bucket not in buckets:
                     buckets[bucket] = {"eco": 0, "war": 0, "unknown": 0}
-                if mode == "eco":
-                    buckets[bucket]["eco"] += 1
-                elif mode == "war":
-                    buckets[bucket]["war"] += 1
-                else:
-                    buckets[bucket]["unknown"] += 1
+                buckets[bucket][mode] += n
                 if last_updated is None or (upd and upd > last_updated):
                     last_updated = upd
         return buckets, last_updated
 
-    async def get_skill_mode_by_mu(
+    async def iter_skill_mode_by_mu(
         self, country_id: str | None
-    ) -> dict[str, dict]:
-        """Return eco/war/unknown counts + per-player rows grouped by MU name.
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """Yield ``(mu_name, group)`` one MU at a time ("" → players without an MU).
 
-        Returns a dict keyed by mu_name (None key → players without an MU).
-        Each entry: {"eco": n, "war": n, "unknown": n,
+        Each group: {"eco": n, "war": n, "unknown": n,
                      "players": [{"citizen_name", "level", "skill_mode"}, …]}
-        Players within each MU are sorted by level DESC.
+        Rows arrive ordered by MU, so only the current group's dicts are built
+        at a time. The rows are fetched before the first yield, so the pooled
+        reader is never held while a consumer runs (or abandons the iterator).
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
+        sql = "SELECT mu_name, citizen_name, level, skill_mode FROM citizen_levels"
+        params: tuple = ()
         if country_id:
-            sql = (
-                "SELECT mu_name, citizen_name, level, skill_mode "
-                "FROM citizen_levels WHERE country_id = ? "
-                "ORDER BY mu_name, level DESC"
-            )
-            params: tuple = (country_id,)
-        else:
-            sql = (
-                "SELECT mu_name, citizen_name, level, skill_mode "
-                "FROM citizen_levels ORDER BY mu_name, level DESC"
-            )
-            params = ()
-        mus: dict[str, dict] = {}
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                mu, name, level, mode = row
+            sql += " WHERE country_id = ?"
+            params = (country_id,)
+        sql += " ORDER BY mu_name, level DESC"
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+        key: str | None = None
+        group: dict = {}
+        for mu, name, level, mode in rows:
+            # NULL and "" sort next to each other and share the "" group
+            if (mu or "") != key:
+                if key is not None:
+                    yield key, group
                 key = mu or ""
-                if key not in mus:
-                    mus[key] = {"eco": 0, "war": 0, "unknown": 0, "players": []}
-                if mode == "eco":
-                    mus[key]["eco"] += 1
-                elif mode == "war":
-                    mus[key]["war"] += 1
-                else:
-                    mus[key]["unknown"] += 1
-                mus[key]["players"].append({
-                    "citizen_name": name or "?",
-                    "level": level,
-                    "skill_mode": mode,
-                })
-        return mus
+                group = {"eco": 0, "war": 0, "unknown": 0, "players": []}
+            group[mode if mode in ("eco", "war") else "unknown"] += 1
+            group["players"].append({
+                "citizen_name": name or "?",
+                "level": level,
+                "skill_mode": mode,
+            })
+        if key is not None:
+            yield key, group
 
-    async def get_citizen_cooldowns_by_mu(
+    async def get_skill_mode_by_mu(
         self, country_id: str | None
     ) -> dict[str, dict]:
-        """Return skill-reset cooldown stats + per-player rows grouped by MU name.
+        """Return eco/war/unknown counts + per-player rows grouped by MU name.
+
+        Returns a dict keyed by mu_name ("" → players without an MU), built
+        from :meth:`iter_skill_mode_by_mu`. Players within each MU are sorted
+        by level DESC.
+        """
+        return {mu: group async for mu, group in self.iter_skill_mode_by_mu(country_id)}
 
-        Returns a dict keyed by mu_name ("" → players without an MU).
-        Each entry: {"count": n_with_reset_data, "sum_days": float,
+    async def iter_citizen_cooldowns_by_mu(
+        self, country_id: str | None
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """Yield ``(mu_name, group)`` one MU at a time ("" → players without an MU).
+
+        Each group: {"count": n_with_reset_data, "sum_days": float,
                      "available": n_can_reset, "no_data": n,
                      "players": [{"citizen_name", "level", "days_ago", "can_reset"}, …]}
-        Players within each MU are sorted by level DESC.
+        Rows arrive ordered by MU, so only the current group's dicts are built
+        at a time; as above, rows are fetched before the first yield.
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
+        sql = f"SELECT mu_name, citizen_name, level, {self._DAYS_SINCE_RESET} FROM citizen_levels"
+        params: tuple = ()
         if country_id:
-            sql = (
-                "SELECT mu_name, citizen_name, level, last_skills_reset_at "
-                "FROM citizen_levels WHERE country_id = ? "
-                "ORDER BY mu_name, level DESC"
-            )
-            params: tuple = (country_id,)
-        else:
-            sql = (
-                "SELECT mu_name, citizen_name, level, last_skills_reset_at "
-                "FROM citizen_levels ORDER BY mu_name, level DESC"
-            )
-            params = ()
-        mus: dict[str, dict] = {}
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                mu, name, level, reset_at = row
+            sql += " WHERE country_id = ?"
+            params = (country_id,)
+        sql += " ORDER BY mu_name, level DESC"
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            rows = await cur.fetchall()
+        key: str | None = None
+        b: dict = {}
+        for mu, name, level, days_ago in rows:
+            if (mu or "") != key:
+                if key is not None:
+                    yield key, b
                 key = mu or ""
-                if key not in mus:
-                    mus[key] = {"count": 0, "sum_days": 0.0, "available": 0, "no_data": 0, "players": []}
-                b = mus[key]
-                days_ago: float | None = None
+                b = {"count": 0, "sum_days": 0.0, "available": 0, "no_data": 0, "players": []}
+            if days_ago is None:
                 can_reset = True
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        can_reset = days_ago >= 7
-                        b["count"] += 1
-                        b["sum_days"] += days_ago
-                        if can_reset:
-                            b["available"] += 1
-                    except Exception:
-                        b["no_data"] += 1
-                        b["available"] += 1
-                else:
-                    b["no_data"] += 1
-                    b["available"] += 1
-                b["players"].append({
-                    "citizen_name": name or "?",
-                    "level": level,
-                    "days_ago": days_ago,
-                    "can_reset": can_reset,
-                })
-        return mus
+                b["no_data"] += 1
+            else:
+                can_reset = days_ago >= 7
+                b["count"] += 1
+                b["sum_days"] += days_ago
+            if can_reset:
+                b["available"] += 1
+            b["players"].append({
+                "citizen_name": name or "?",
+                "level": level,
+                "days_ago": days_ago,
+                "can_reset": can_reset,
+            })
+        if key is not None:
+            yield key, b
+
+    async def get_citizen_cooldowns_by_mu(
+        self, country_id: str | None
+    ) -> dict[str, dict]:
+        """Return skill-reset cooldown stats + per-player rows grouped by MU name.
+
+        Returns a dict keyed by mu_name ("" → players without an MU), built
+        from :meth:`iter_citizen_cooldowns_by_mu`. Players within each MU are
+        sorted by level DESC.
+        """
+        return {mu: group async for mu, group in self.iter_citizen_cooldowns_by_mu(country_id)}
 
     async def get_skill_reset_cooldown_by_level_buckets(
         self, country_id: str | None
@@ -579,58 +1100,34 @@ class Database:
            "available": citizens_who_can_reset_now, "no_data": citizens_without_reset_ts}
         plus the most-recent updated_at string.
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         # Only count eco-mode (or unknown) players — war-mode players can already fight
         # and don't need to reset, so their cooldown is irrelevant for readiness purposes.
+        # Citizens without a (parseable) reset timestamp are counted as able to reset.
+        sql = (
+            "SELECT bucket, COUNT(days), TOTAL(days), "
+            "SUM(CASE WHEN days IS NULL OR days >= 7 THEN 1 ELSE 0 END), "
+            "SUM(CASE WHEN days IS NULL THEN 1 ELSE 0 END), MAX(updated_at) "
+            "FROM (SELECT ((COALESCE(NULLIF(level, 0), 1) - 1) / 5) * 5 + 1 AS bucket, "
+            f"{self._DAYS_SINCE_RESET} AS days, updated_at FROM citizen_levels "
+            "WHERE (skill_mode IS NULL OR skill_mode != 'war')"
+        )
+        params: tuple = ()
         if country_id:
-            sql = (
-                "SELECT level, last_skills_reset_at, updated_at FROM citizen_levels "
-                "WHERE country_id = ? AND (skill_mode IS NULL OR skill_mode != 'war')"
-            )
-            params: tuple = (country_id,)
-        else:
-            sql = (
-                "SELECT level, last_skills_reset_at, updated_at FROM citizen_levels "
-                "WHERE skill_mode IS NULL OR skill_mode != 'war'"
-            )
-            params = ()
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
-        buckets: dict[int, dict] = {}
+            sql += " AND country_id = ?"
+            params = (country_id,)
+        sql += ") GROUP BY bucket"
+        result: dict[int, dict] = {}
         last_updated: str | None = None
-        async with self._conn.execute(sql, params) as cur:
-            async for row in cur:
-                level, reset_at, upd = row
-                bucket = ((int(level or 1) - 1) // 5) * 5 + 1
-                if bucket not in buckets:
-                    buckets[bucket] = {"count": 0, "sum_days": 0.0, "available": 0, "no_data": 0}
-                b = buckets[bucket]
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        b["count"] += 1
-                        b["sum_days"] += days_ago
-                        if days_ago >= 7:
-                            b["available"] += 1
-                    except Exception:
-                        b["no_data"] += 1
-                        b["available"] += 1  # parse failed → assume can reset
-                else:
-                    b["no_data"] += 1
-                    b["available"] += 1  # never reset → can reset
+        async with self._read() as conn, conn.execute(sql, params) as cur:
+            async for bucket, count, sum_days, available, no_data, upd in cur:
+                result[bucket] = {
+                    "count": count,
+                    "avg_days_ago": sum_days / count if count else 0.0,
+                    "available": available,
+                    "no_data": no_data,
+                }
                 if last_updated is None or (upd and upd > last_updated):
                     last_updated = upd
-        # convert sum_days -> avg_days_ago
-        result: dict[int, dict] = {}
-        for bkt, b in buckets.items():
-            result[bkt] = {
-                "count": b["count"],
-                "avg_days_ago": b["sum_days"] / b["count"] if b["count"] else 0.0,
-                "available": b["available"],
-                "no_data": b["no_data"],
-            }
         return result, last_updated
 
 
@@ -641,30 +1138,18 @@ class Database:
 
         Each dict: user_id, citizen_name, level, last_skills_reset_at, days_ago, can_reset
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
-        sql = """
-            SELECT user_id, citizen_name, level, last_skills_reset_at
+        sql = f"""
+            SELECT user_id, citizen_name, level, last_skills_reset_at, {self._DAYS_SINCE_RESET}
             FROM citizen_levels
             WHERE country_id = ?
             ORDER BY level DESC, user_id
             LIMIT ?
         """
         rows: list[dict] = []
-        async with self._conn.execute(sql, (country_id, limit)) as cur:
+        async with self._read() as conn, conn.execute(sql, (country_id, limit)) as cur:
             async for row in cur:
-                uid, name, level, reset_at = row
-                days_ago: float | None = None
-                can_reset = True
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        can_reset = days_ago >= 7
-                    except Exception:
-                        pass
+                uid, name, level, reset_at, days_ago = row
+                can_reset = days_ago is None or days_ago >= 7
                 rows.append({
                     "user_id": uid,
                     "citizen_name": name or uid,
@@ -681,30 +1166,18 @@ class Database:
         Returns up to 10 matches ordered by level DESC.
         Each dict: user_id, citizen_name, level, country_id, last_skills_reset_at, days_ago, can_reset
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
-        sql = """
-            SELECT user_id, citizen_name, level, country_id, last_skills_reset_at
+        sql = f"""
+            SELECT user_id, citizen_name, level, country_id, last_skills_reset_at, {self._DAYS_SINCE_RESET}
             FROM citizen_levels
             WHERE user_id = ? OR lower(citizen_name) LIKE lower(?)
             ORDER BY level DESC
             LIMIT 10
         """
         rows: list[dict] = []
-        async with self._conn.execute(sql, (query, f"%{query}%")) as cur:
+        async with self._read() as conn, conn.execute(sql, (query, f"%{query}%")) as cur:
             async for row in cur:
-                uid, name, level, country_id, reset_at = row
-                days_ago: float | None = None
-                can_reset = True
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        can_reset = days_ago >= 7
-                    except Exception:
-                        pass
+                uid, name, level, country_id, reset_at, days_ago = row
+                can_reset = days_ago is None or days_ago >= 7
                 rows.append({
                     "user_id": uid,
                     "citizen_name": name or uid,
@@ -723,30 +1196,18 @@ class Database:
         Each dict: user_id, citizen_name, level, country_id, skill_mode,
                    last_skills_reset_at, days_ago, can_reset
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
-        sql = """
-            SELECT user_id, citizen_name, level, country_id, skill_mode, last_skills_reset_at
+        sql = f"""
+            SELECT user_id, citizen_name, level, country_id, skill_mode, last_skills_reset_at, {self._DAYS_SINCE_RESET}
             FROM citizen_levels
             WHERE user_id = ? OR lower(citizen_name) LIKE lower(?)
             ORDER BY level DESC
             LIMIT 10
         """
         rows: list[dict] = []
-        async with self._conn.execute(sql, (query, f"%{query}%")) as cur:
+        async with self._read() as conn, conn.execute(sql, (query, f"%{query}%")) as cur:
             async for row in cur:
-                uid, name, level, country_id, mode, reset_at = row
-                days_ago: float | None = None
-                can_reset = True
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        can_reset = days_ago >= 7
-                    except Exception:
-                        pass
+                uid, name, level, country_id, mode, reset_at, days_ago = row
+                can_reset = days_ago is None or days_ago >= 7
                 rows.append({
                     "user_id": uid,
                     "citizen_name": name or uid,
@@ -767,10 +1228,6 @@ class Database:
         mu_query is matched case-insensitively; exact match is preferred over partial.
         Each player dict: citizen_name, level, skill_mode, days_ago, can_reset
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
         # Find all matching MU names
         if country_id:
             sql_mu = (
@@ -785,7 +1242,7 @@ class Database:
             )
             params_mu = (f"%{mu_query}%",)
         mu_names: list[str] = []
-        async with self._conn.execute(sql_mu, params_mu) as cur:
+        async with self._read() as conn, conn.execute(sql_mu, params_mu) as cur:
             async for row in cur:
                 if row[0]:
                     mu_names.append(row[0])
@@ -797,30 +1254,22 @@ class Database:
         # Fetch all players in that MU
         if country_id:
             sql = (
-                "SELECT citizen_name, level, skill_mode, last_skills_reset_at "
+                f"SELECT citizen_name, level, skill_mode, {self._DAYS_SINCE_RESET} "
                 "FROM citizen_levels WHERE mu_name = ? AND country_id = ? "
                 "ORDER BY level DESC"
             )
             params2: tuple = (mu_name, country_id)
         else:
             sql = (
-                "SELECT citizen_name, level, skill_mode, last_skills_reset_at "
+                f"SELECT citizen_name, level, skill_mode, {self._DAYS_SINCE_RESET} "
                 "FROM citizen_levels WHERE mu_name = ? ORDER BY level DESC"
             )
             params2 = (mu_name,)
         players: list[dict] = []
-        async with self._conn.execute(sql, params2) as cur:
+        async with self._read() as conn, conn.execute(sql, params2) as cur:
             async for row in cur:
-                name, level, mode, reset_at = row
-                days_ago: float | None = None
-                can_reset = True
-                if reset_at:
-                    try:
-                        ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                        days_ago = (now - ts).total_seconds() / 86400
-                        can_reset = days_ago >= 7
-                    except Exception:
-                        pass
+                name, level, mode, days_ago = row
+                can_reset = days_ago is None or days_ago >= 7
                 players.append({
                     "citizen_name": name or "?",
                     "level": level,
@@ -832,8 +1281,6 @@ class Database:
 
     async def get_distinct_mu_names(self, country_id: str | None = None) -> list[str]:
         """Return all distinct non-null MU names, optionally filtered by country."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         if country_id:
             sql = (
                 "SELECT DISTINCT mu_name FROM citizen_levels "
@@ -844,7 +1291,7 @@ class Database:
             sql = "SELECT DISTINCT mu_name FROM citizen_levels WHERE mu_name IS NOT NULL ORDER BY mu_name"
             params = ()
         names: list[str] = []
-        async with self._conn.execute(sql, params) as cur:
+        async with self._read() as conn, conn.execute(sql, params) as cur:
             async for row in cur:
                 if row[0]:
                     names.append(row[0])
@@ -860,26 +1307,22 @@ class Database:
           can_reset    – eco players who can reset right now
           waiting_days – list of days_ago values for eco players still in cooldown
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        from datetime import datetime, timezone
-        now = datetime.now(timezone.utc)
         if country_id:
             sql = (
-                "SELECT mu_name, skill_mode, last_skills_reset_at "
+                f"SELECT mu_name, skill_mode, {self._DAYS_SINCE_RESET} "
                 "FROM citizen_levels WHERE country_id = ? AND mu_name IS NOT NULL"
             )
             params: tuple = (country_id,)
         else:
             sql = (
-                "SELECT mu_name, skill_mode, last_skills_reset_at "
+                f"SELECT mu_name, skill_mode, {self._DAYS_SINCE_RESET} "
                 "FROM citizen_levels WHERE mu_name IS NOT NULL"
             )
             params = ()
         mus: dict[str, dict] = {}
-        async with self._conn.execute(sql, params) as cur:
+        async with self._read() as conn, conn.execute(sql, params) as cur:
             async for row in cur:
-                mu_name, mode, reset_at = row
+                mu_name, mode, days_ago = row
                 if mu_name not in mus:
                     mus[mu_name] = {"war": 0, "total": 0, "can_reset": 0, "waiting_days": []}
                 m = mus[mu_name]
@@ -887,62 +1330,70 @@ class Database:
                 if mode == "war":
                     m["war"] += 1
                 else:
-                    # eco / unknown — compute cooldown
-                    can_reset = True
-                    if reset_at:
-                        try:
-                            ts = datetime.fromisoformat(reset_at.replace("Z", "+00:00"))
-                            days_ago = (now - ts).total_seconds() / 86400
-                            can_reset = days_ago >= 7
-                            if not can_reset:
-                                m["waiting_days"].append(days_ago)
-                        except Exception:
-                            pass
-                    if can_reset:
+                    # eco / unknown — no (parseable) reset timestamp means they can reset
+                    if days_ago is None or days_ago >= 7:
                         m["can_reset"] += 1
+                    else:
+                        m["waiting_days"].append(days_ago)
         return mus
 
     async def has_seen_article(self, article_id: str) -> bool:
         """Return True if this article has already been posted to Discord."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         async with self._conn.execute(
             "SELECT 1 FROM seen_articles WHERE article_id = ?", (article_id,)
         ) as cur:
             return await cur.fetchone() is not None
 
+    async def _filter_unseen(self, table: str, column: str, ids: Iterable[str]) -> set[str]:
+        """Return the subset of *ids* not present in *table*.*column*, one query per chunk.
+
+        Runs on the writer so deferred (not yet committed) marks are visible.
+        """
+        unseen = set(ids)
+        pending = list(unseen)
+        for start in range(0, len(pending), self._MAX_VARIABLES):
+            chunk = pending[start : start + self._MAX_VARIABLES]
+            marks = ", ".join(["?"] * len(chunk))
+            async with self._conn.execute(
+                f"SELECT {column} FROM {table} WHERE {column} IN ({marks})", chunk
+            ) as cur:
+                unseen.difference_update(row[0] for row in await cur.fetchall())
+        return unseen
+
+    async def filter_unseen_articles(self, article_ids: Iterable[str]) -> set[str]:
+        """Return the article IDs from *article_ids* that have not been posted yet."""
+        return await self._filter_unseen("seen_articles", "article_id", article_ids)
+
     async def mark_article_seen(self, article_id: str) -> None:
         """Record that this article has been posted so we don't post it again."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         from datetime import datetime, timezone
         now = datetime.now(timezone.utc).isoformat()
-        await self._conn.execute(
-            "INSERT OR IGNORE INTO seen_articles(article_id, seen_at) VALUES(?, ?)",
-            (article_id, now),
-        )
-        await self._conn.commit()
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO seen_articles(article_id, seen_at) VALUES(?, ?)",
+                (article_id, now),
+            )
 
     async def has_seen_event(self, event_id: str) -> bool:
         """Return True if this event has already been posted to Discord."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         async with self._conn.execute(
             "SELECT 1 FROM seen_events WHERE event_id = ?", (event_id,)
         ) as cur:
             return await cur.fetchone() is not None
 
+    async def filter_unseen_events(self, event_ids: Iterable[str]) -> set[str]:
+        """Return the event IDs from *event_ids* that have not been posted yet."""
+        return await self._filter_unseen("seen_events", "event_id", event_ids)
+
     async def mark_event_seen(self, event_id: str) -> None:
         """Record that this event has been posted so we don't post it again."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         from datetime import datetime, timezone
         now = datetime.now(timezone.utc).isoformat()
-        await self._conn.execute(
-            "INSERT OR IGNORE INTO seen_events(event_id, seen_at) VALUES(?, ?)",
-            (event_id, now),
-        )
-        await self._conn.commit()
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO seen_events(event_id, seen_at) VALUES(?, ?)",
+                (event_id, now),
+            )
 
     async def store_war_event(
         self,
@@ -960,25 +1411,16 @@ class Database:
         raw_json: str,
     ) -> None:
         """Store a war/battle event for historical reference."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            """
-            INSERT OR REPLACE INTO war_events
-                (event_id, event_type, battle_id, war_id,
-                 attacker_country_id, defender_country_id,
-                 region_id, region_name, attacker_name, defender_name,
-                 created_at, raw_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                event_id, event_type, battle_id, war_id,
-                attacker_country_id, defender_country_id,
-                region_id, region_name, attacker_name, defender_name,
-                created_at, raw_json,
-            ),
-        )
-        await self._conn.commit()
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                self._UPSERT_WAR_EVENT,
+                (
+                    event_id, event_type, battle_id, war_id,
+                    attacker_country_id, defender_country_id,
+                    region_id, region_name, attacker_name, defender_name,
+                    created_at, raw_json,
+                ),
+            )
 
     # ------------------------------------------------------------------ #
     # Citizen luck ranking                                                 #
@@ -993,32 +1435,35 @@ class Database:
         opens_count: int,
         updated_at: str,
     ) -> None:
-        """Insert or replace a citizen's luck score (batch — call flush_luck_scores after)."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            """
-            INSERT OR REPLACE INTO citizen_luck
-                (user_id, country_id, citizen_name, luck_score, opens_count, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (user_id, country_id, citizen_name, luck_score, opens_count, updated_at),
-        )
+        """Insert or update a citizen's luck score (batch — call flush_luck_scores after)."""
+        async with self._deferred_write() as conn:
+            await conn.execute(
+                self._UPSERT_LUCK_SCORE,
+                (user_id, country_id, citizen_name, luck_score, opens_count, updated_at),
+            )
+
+    async def bulk_upsert_luck_scores(self, rows: Iterable[tuple]) -> None:
+        """Insert or update many luck scores in one transaction.
+
+        Each row is ``(user_id, country_id, citizen_name, luck_score,
+        opens_count, updated_at)``, as for :meth:`upsert_luck_score`.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        async with self._write_tx() as conn:
+            await self._execute_values(conn, self._UPSERT_LUCK_SCORE, rows)
 
     async def flush_luck_scores(self) -> None:
         """Commit any pending luck score upserts."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.commit()
+        await self.flush()
 
     async def delete_luck_scores_for_country(self, country_id: str) -> None:
         """Remove all luck scores for a country before a fresh rebuild."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
-        await self._conn.execute(
-            "DELETE FROM citizen_luck WHERE country_id = ?", (country_id,)
-        )
-        await self._conn.commit()
+        async with self._write_tx() as conn:
+            await conn.execute(
+                "DELETE FROM citizen_luck WHERE country_id = ?", (country_id,)
+            )
 
     async def get_luck_ranking(
         self, country_id: str
@@ -1027,10 +1472,8 @@ class Database:
 
         Each dict: user_id, citizen_name, luck_score, opens_count, updated_at.
         """
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         rows: list[dict] = []
-        async with self._conn.execute(
+        async with self._read() as conn, conn.execute(
             """
             SELECT user_id, citizen_name, luck_score, opens_count, updated_at
             FROM citizen_luck
@@ -1053,10 +1496,8 @@ class Database:
         self, country_id: str
     ) -> list[tuple[str, str | None]]:
         """Return (user_id, citizen_name) for all cached citizens of a country."""
-        if not self._conn:
-            raise RuntimeError("Database not initialized; call setup() first")
         rows: list[tuple[str, str | None]] = []
-        async with self._conn.execute(
+        async with self._read() as conn, conn.execute(
             "SELECT user_id, citizen_name FROM citizen_levels WHERE country_id = ?",
             (country_id,),
         ) as cur:
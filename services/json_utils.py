@@ -0,0 +1,31 @@
+"""JSON helpers that use orjson when it is installed.
+
+orjson is noticeably faster than the stdlib encoder on the large API payloads
+we persist (country snapshots, raw events). It is optional: when it is not
+importable the stdlib ``json`` module is used with equivalent settings.
+"""
+
+import json as _json
+from typing import Any
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    _orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """Serialize *obj* to a compact JSON ``str`` (non-ASCII kept as-is)."""
+    if _orjson is not None:
+        return _orjson.dumps(obj, default=str).decode()
+    return _json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: str | bytes) -> Any:
+    """Parse a JSON document from ``str`` or ``bytes``."""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return _json.loads(data)
+
+
+__all__ = ["dumps", "loads"]
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from services.api_client import APIClient
+
+
+def test_batch_get_fallback_unwraps_single_results():
+	client = APIClient(base_url="https://api.example.local")
+
+	async def fake_request(method, path, **kwargs):
+		if "batch=1" in path:
+			raise RuntimeError("batch endpoint down")
+		user_id = kwargs["params"]["input"]
+		return {"result": {"data": {"_id": user_id, "username": "player"}}}
+
+	client._request = fake_request
+	results = asyncio.run(client.batch_get("/user.getUserLite", ['"u1"', '"u2"']))
+
+	assert results == [
+		{"_id": '"u1"', "username": "player"},
+		{"_id": '"u2"', "username": "player"},
+	]
@@ -0,0 +1,26 @@
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("aiosqlite")
+
+from services.citizen_cache import CitizenCache
+
+
+def test_user_cache_drops_entries_past_stale_window():
+    cache = CitizenCache(None, None, stale_window=60.0)
+    now = time.monotonic()
+    cache._cache_user("old", now - 120.0, ("fields",))
+    cache._cache_user("fresh", now, ("fields",))
+
+    assert list(cache._user_cache) == ["fresh"]
+
+
+def test_user_cache_is_bounded():
+    cache = CitizenCache(None, None, max_users=2)
+    now = time.monotonic()
+    for uid in ("a", "b", "c"):
+        cache._cache_user(uid, now, ("fields",))
+
+    assert list(cache._user_cache) == ["b", "c"]